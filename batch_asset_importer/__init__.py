@@ -4,7 +4,7 @@ bl_info = {
     "version": (0, 0, 4),
     "blender": (4, 2, 0),
     "location": "3D View > Side Panel > BatchImport",
-    "description": "An add-on to batch import all the FBX files and texture sets in a folder.",
+    "description": "An add-on to batch import all the mesh files and texture sets in a folder.",
     "warning": "",
     "wiki_url": "",
     "category": "Import-Export",
@@ -14,10 +14,27 @@ bl_info = {
 if "bpy" in locals():
     from importlib import reload
     reload(catalog)
+    reload(cache)
+    reload(profiling)
+    reload(textures)
+    reload(scanner)
+    reload(images)
+    reload(meshes)
+    reload(packing)
     reload(functions)
+    reload(lods)
+    reload(materials)
+    reload(previews)
+    reload(workers)
+    reload(proxies)
+    reload(pipeline)
     reload(operators)
+    reload(cli)
 else:
-    from . import catalog, functions, operators
+    from . import (
+        catalog, cache, profiling, textures, scanner, images, meshes, packing, functions, lods, materials, previews, workers,
+        proxies, pipeline, operators, cli
+    )
 
 
 import bpy
@@ -46,12 +63,83 @@ class TextureMappingNamesProperties(bpy.types.PropertyGroup):
     opacity: bpy.props.StringProperty(name="Opacity", default="opacity")
     emissive: bpy.props.StringProperty(name="Emissive", default="emissive")
     specular: bpy.props.StringProperty(name="Specular", default="specular")
+    base_color_aliases: bpy.props.StringProperty(
+        name="Base Color Aliases",
+        description="Comma separated names that identify base color maps at the end of texture file names",
+        default=textures.DEFAULT_ALIASES["base_color"]
+    )
+    ao_aliases: bpy.props.StringProperty(
+        name="AO Aliases",
+        description="Comma separated names that identify AO maps at the end of texture file names",
+        default=textures.DEFAULT_ALIASES["ao"]
+    )
+    metallic_aliases: bpy.props.StringProperty(
+        name="Metallic Aliases",
+        description="Comma separated names that identify metallic maps at the end of texture file names",
+        default=textures.DEFAULT_ALIASES["metallic"]
+    )
+    roughness_aliases: bpy.props.StringProperty(
+        name="Roughness Aliases",
+        description="Comma separated names that identify roughness maps at the end of texture file names",
+        default=textures.DEFAULT_ALIASES["roughness"]
+    )
+    glossy_aliases: bpy.props.StringProperty(
+        name="Glossy Aliases",
+        description="Comma separated names that identify glossy maps at the end of texture file names",
+        default=textures.DEFAULT_ALIASES["glossy"]
+    )
+    normal_aliases: bpy.props.StringProperty(
+        name="Normal Aliases",
+        description="Comma separated names that identify normal maps at the end of texture file names",
+        default=textures.DEFAULT_ALIASES["normal"]
+    )
+    bump_aliases: bpy.props.StringProperty(
+        name="Bump Aliases",
+        description="Comma separated names that identify bump maps at the end of texture file names",
+        default=textures.DEFAULT_ALIASES["bump"]
+    )
+    displacement_aliases: bpy.props.StringProperty(
+        name="Displacement Aliases",
+        description="Comma separated names that identify displacement maps at the end of texture file names",
+        default=textures.DEFAULT_ALIASES["displacement"]
+    )
+    opacity_aliases: bpy.props.StringProperty(
+        name="Opacity Aliases",
+        description="Comma separated names that identify opacity maps at the end of texture file names",
+        default=textures.DEFAULT_ALIASES["opacity"]
+    )
+    emissive_aliases: bpy.props.StringProperty(
+        name="Emissive Aliases",
+        description="Comma separated names that identify emissive maps at the end of texture file names",
+        default=textures.DEFAULT_ALIASES["emissive"]
+    )
+    specular_aliases: bpy.props.StringProperty(
+        name="Specular Aliases",
+        description="Comma separated names that identify specular maps at the end of texture file names",
+        default=textures.DEFAULT_ALIASES["specular"]
+    )
+    separators: bpy.props.StringProperty(
+        name="Separators",
+        description="The characters separating the words of the texture file names",
+        default=textures.DEFAULT_SEPARATORS
+    )
+    is_case_sensitive: bpy.props.BoolProperty(
+        name="Case Sensitive",
+        description="Match the aliases with the texture file names case sensitively",
+        default=False
+    )
+    use_packed_maps: bpy.props.BoolProperty(
+        name="Packed Maps",
+        description="Recognize the packed AO, roughness and metallic maps ending with ORM, ARM, MRAO or RMA, "
+                    "and split their channels in the materials",
+        default=True
+    )
 
 
 class BatchImportAssetsProperties(bpy.types.PropertyGroup):
     folder_path: bpy.props.StringProperty(
         name="Folder Path",
-        description="The path to the folder containing the FBX files and texture sets",
+        description="The path to the folder containing the mesh files and texture sets",
         default="",
         subtype='DIR_PATH',
         update=update_folder_path
@@ -93,14 +181,204 @@ class BatchImportAssetsProperties(bpy.types.PropertyGroup):
         default=True
     )
     is_import_fbx: bpy.props.BoolProperty(
-        name="Import FBX",
-        description="Import the FBX file in the folder",
+        name="Import Meshes",
+        description="Import the FBX, glTF, OBJ and USD files in the folder",
+        default=True
+    )
+    mesh_format_order: bpy.props.StringProperty(
+        name="Format Order",
+        description="Comma separated mesh formats, in order of preference. When a file name exists in several "
+                    "formats, only the first one is imported",
+        default=scanner.DEFAULT_FORMAT_ORDER
+    )
+    is_incremental: bpy.props.BoolProperty(
+        name="Incremental Import",
+        description="Only import the asset folders that are new or modified since the last import, "
+                    "and remove the assets of deleted folders",
+        default=True
+    )
+    use_content_hash: bpy.props.BoolProperty(
+        name="Compare File Contents",
+        description="Hash the file contents to detect changes, so touched but unchanged files are not imported again",
+        default=False
+    )
+    use_lods: bpy.props.BoolProperty(
+        name="Generate LODs",
+        description="Decimate LOD levels of the heavy imported meshes. They are hidden objects of the asset "
+                    "collection with the Collection asset type, and alternate meshes stored on the object otherwise",
+        default=False
+    )
+    lod_ratios: bpy.props.StringProperty(
+        name="LOD Ratios",
+        description="Comma separated decimation ratios of the LOD levels, relative to the imported mesh",
+        default=lods.DEFAULT_LOD_RATIOS
+    )
+    lod_min_faces: bpy.props.IntProperty(
+        name="LOD Min Faces",
+        description="Only generate LODs for the meshes with at least this many faces",
+        default=10000,
+        min=0
+    )
+    use_mesh_deduplication: bpy.props.BoolProperty(
+        name="Deduplicate Meshes",
+        description="Share a single mesh between the imported objects with identical geometry, even across asset "
+                    "folders. Objects sharing a mesh keep their own materials in object-level slots",
+        default=True
+    )
+    use_image_deduplication: bpy.props.BoolProperty(
+        name="Deduplicate Textures",
+        description="Use a single image for the texture files with identical contents, even across asset folders",
         default=True
     )
+    is_lazy_textures: bpy.props.BoolProperty(
+        name="Lazy Textures",
+        description="Only reference the texture files during the import, without reading their pixels. "
+                    "Maps that are turned off are skipped, and the pixels decoded for the previews are freed "
+                    "once the previews are done",
+        default=False
+    )
+    texture_proxy_tier: bpy.props.EnumProperty(
+        name="Texture Resolution",
+        description="Load reduced resolution proxies of the textures, converted in background processes and cached. "
+                    "The full resolution files can be swapped in later",
+        items=(
+            ("FULL", "Full", "Load the source textures"),
+            ("4K", "4K", "Load proxies of at most 4096 pixels"),
+            ("2K", "2K", "Load proxies of at most 2048 pixels"),
+            ("1K", "1K", "Load proxies of at most 1024 pixels"),
+        ),
+        default="FULL"
+    )
+    texture_proxy_format: bpy.props.EnumProperty(
+        name="Proxy Format",
+        description="The file format of the texture proxies. Height maps are always stored as PNG",
+        items=(
+            ("JPEG", "JPEG", "Smallest files, without alpha"),
+            ("WEBP", "WebP", "Small files, with alpha"),
+            ("PNG", "PNG", "Lossless"),
+        ),
+        default="JPEG"
+    )
+    texture_proxy_quality: bpy.props.IntProperty(
+        name="Proxy Quality",
+        description="The compression quality of the lossy texture proxies",
+        default=90,
+        min=10,
+        max=100
+    )
+    texture_proxy_folder: bpy.props.StringProperty(
+        name="Proxy Folder",
+        description="The folder the texture proxies and packed textures are cached in. By default, a "
+                    "texture_proxies folder next to the blend file",
+        default="",
+        subtype='DIR_PATH'
+    )
+    use_texture_packing: bpy.props.BoolProperty(
+        name="Pack Textures",
+        description="Merge the separate AO, roughness and metallic files of an asset folder into a single ORM "
+                    "texture, cached next to the texture proxies. One image is loaded instead of three",
+        default=False
+    )
+    use_material_templates: bpy.props.BoolProperty(
+        name="Material Templates",
+        description="Build the node tree once for each combination of maps, and copy it for the other materials",
+        default=True
+    )
+    preview_backend: bpy.props.EnumProperty(
+        name="Preview Backend",
+        description="How the asset previews are rendered",
+        items=(
+            ("BLENDER", "Blender", "Use the built-in preview jobs, a few at a time"),
+            ("WORKERS", "Workers",
+             "Render the previews in background Blender processes, in parallel and also in background mode"),
+        ),
+        default="BLENDER"
+    )
+    preview_engine: bpy.props.EnumProperty(
+        name="Preview Engine",
+        description="The render engine of the preview workers",
+        items=(
+            ("CYCLES", "Cycles", "Path traced on the CPU with a low sample count. Works without a GPU"),
+            ("WORKBENCH", "Workbench", "Fast solid shading with the base color textures. Needs an OpenGL context, "
+                                       "falls back to Cycles without one"),
+        ),
+        default="CYCLES"
+    )
+    preview_size: bpy.props.IntProperty(
+        name="Preview Size",
+        description="The resolution of the previews rendered by the workers",
+        default=256,
+        min=32,
+        max=1024
+    )
+    preview_worker_count: bpy.props.IntProperty(
+        name="Preview Workers",
+        description="The number of background Blender processes rendering the previews",
+        default=4,
+        min=1,
+        soft_max=os.cpu_count() or 1
+    )
+    preview_batch_size: bpy.props.IntProperty(
+        name="Preview Batch Size",
+        description="The number of asset previews rendered at a time, after the import",
+        default=8,
+        min=1,
+        soft_max=64
+    )
+    is_save_after_previews: bpy.props.BoolProperty(
+        name="Save After Previews",
+        description="Save the file again once all the asset previews are rendered, so they are kept",
+        default=True
+    )
+    use_bulk_mode: bpy.props.BoolProperty(
+        name="Bulk Mode",
+        description="Disable undo during the import, so the operators it runs don't copy the whole file for "
+                    "their undo steps. Uses much less memory on large imports, but the import can't be undone",
+        default=False
+    )
+    is_write_report: bpy.props.BoolProperty(
+        name="Write Report",
+        description="Write a JSON report with the timings of every stage next to the blend file",
+        default=True
+    )
+    profiled_stage: bpy.props.EnumProperty(
+        name="Profile Stage",
+        description="Run a stage under cProfile, and add its statistics to the report",
+        items=[("NONE", "None", "Don't profile any stage")] + [
+            (identifier, name, description) for identifier, name, description in profiling.STAGES
+        ],
+        default="NONE"
+    )
+    worker_count: bpy.props.IntProperty(
+        name="Worker Processes",
+        description="The number of background Blender processes to import the assets with. "
+                    "With a single worker, the assets are imported in this Blender session",
+        default=1,
+        min=1,
+        soft_max=max(os.cpu_count() or 1, 2)
+    )
+    chunk_size: bpy.props.IntProperty(
+        name="Chunk Size",
+        description="The number of asset folders to import between two UI updates",
+        default=10,
+        min=1,
+        soft_max=100
+    )
+    checkpoint_interval: bpy.props.IntProperty(
+        name="Checkpoint Interval",
+        description="Save the file every N imported asset folders, so an interrupted import can be resumed "
+                    "with Incremental Import. 0 disables the checkpoints. Not used with several workers",
+        default=0,
+        min=0
+    )
     is_expand_map_settings: bpy.props.BoolProperty(
         name="Expand Map Settings",
         default=True
     )
+    is_expand_name_settings: bpy.props.BoolProperty(
+        name="Expand Texture Name Settings",
+        default=False
+    )
     use_ao: bpy.props.BoolProperty(
         name="Use AO",
         description="Use the ambient occlusion texture if available",
@@ -171,6 +449,29 @@ class BatchImportAssetsProperties(bpy.types.PropertyGroup):
         description="The name of the main collection to import the assets",
         default="Assets"
     )
+    catalog_hierarchy: bpy.props.EnumProperty(
+        name="Catalog Hierarchy",
+        description="How the assets are sorted into catalogs",
+        items=(
+            ("FLAT", "Flat", "Put all the models and all the materials in a single catalog each"),
+            ("FOLDERS", "Folders", "Mirror the source folders containing the asset folders as nested catalogs"),
+            ("TOKENS", "Folder Tokens",
+             "Mirror the source folders, and split their names into nested catalogs (e.g. Vendor_Category)"),
+        ),
+        default="FOLDERS"
+    )
+    catalog_token_separators: bpy.props.StringProperty(
+        name="Token Separators",
+        description="The characters splitting the folder names into nested catalogs",
+        default="_"
+    )
+    catalog_depth: bpy.props.IntProperty(
+        name="Catalog Depth",
+        description="The maximum number of nested catalog levels under the models and materials catalogs "
+                    "(0 for no limit)",
+        default=0,
+        min=0
+    )
     asset_type: bpy.props.EnumProperty(
         name="Asset Type",
         description="The type of the assets to be imported",
@@ -182,8 +483,19 @@ class BatchImportAssetsProperties(bpy.types.PropertyGroup):
     )
 
 
+class BatchImportStageTiming(bpy.types.PropertyGroup):
+    seconds: bpy.props.FloatProperty()
+    calls: bpy.props.IntProperty()
+
+
 class BatchImportAssetsWMProperties(bpy.types.PropertyGroup):
-    show_save_info: bpy.props.BoolProperty(default=False)
+    is_generating_previews: bpy.props.BoolProperty(default=False)
+    preview_done: bpy.props.IntProperty()
+    preview_total: bpy.props.IntProperty()
+    stage_timings: bpy.props.CollectionProperty(type=BatchImportStageTiming)
+    total_seconds: bpy.props.FloatProperty()
+    report_path: bpy.props.StringProperty()
+    is_expand_timings: bpy.props.BoolProperty(name="Expand Timings", default=False)
 
 
 class BIA_PT_main_panel(bpy.types.Panel):
@@ -216,7 +528,9 @@ class BIA_PT_main_panel(bpy.types.Panel):
         col.prop(props, "folder_path", text="")
 
         col = box.column(align=True)
-        col.prop(props, "is_import_fbx", text="Import FBX", toggle=True)
+        col.prop(props, "is_import_fbx", text="Import Meshes", toggle=True)
+        if props.is_import_fbx:
+            col.prop(props, "mesh_format_order", text="Formats")
         col.prop(props, "is_import_textures", text="Import Textures", toggle=True)
 
         if props.is_import_textures:
@@ -252,24 +566,112 @@ class BIA_PT_main_panel(bpy.types.Panel):
                     col.prop(props, "bump_distance", text="Bump Distance")
                 if props.use_displacement:
                     col.prop(props, "displacement_scale", text="Disp Scale")
+
+            box0 = box.box()
+            row = box0.row(align=True)
+            row.alignment = "LEFT"
+            row.prop(
+                props, "is_expand_name_settings", text="Texture Names",
+                icon="TRIA_DOWN" if props.is_expand_name_settings else "TRIA_RIGHT", emboss=False
+            )
+
+            if props.is_expand_name_settings:
+                map_names = props.map_names
+                col = box0.column(align=True)
+                col.prop(map_names, "separators", text="Separators")
+                col.prop(map_names, "is_case_sensitive", text="Case Sensitive", toggle=True)
+                col.prop(map_names, "use_packed_maps", text="Packed Maps", toggle=True)
+                col = box0.column(align=True)
+                for field in textures.MAP_FIELDS:
+                    col.prop(map_names, f"{field}_aliases")
         
         col = box.column()
         col.prop(props, "is_apply_transforms", text="Apply Transforms")
+        col.prop(props, "use_mesh_deduplication", text="Deduplicate Meshes")
+        col.prop(props, "use_lods", text="Generate LODs")
+        if props.use_lods:
+            col.prop(props, "lod_ratios", text="Ratios")
+            col.prop(props, "lod_min_faces", text="Min Faces")
         col.prop(props, "is_save_blend_file", text="Save Blend File")
-
-        if wm_props.show_save_info:
+        col.prop(props, "is_incremental", text="Incremental Import")
+        if props.is_incremental:
+            col.prop(props, "use_content_hash", text="Compare File Contents")
+        if props.is_import_textures:
+            col.prop(props, "use_image_deduplication", text="Deduplicate Textures")
+            col.prop(props, "is_lazy_textures", text="Lazy Textures")
+            col.prop(props, "use_material_templates", text="Material Templates")
+            col.prop(props, "use_texture_packing", text="Pack Textures")
+            col.prop(props, "texture_proxy_tier", text="Resolution")
+            if props.texture_proxy_tier != "FULL":
+                col.prop(props, "texture_proxy_format", text="Format")
+                col.prop(props, "texture_proxy_quality", text="Quality")
+                col.prop(props, "texture_proxy_folder", text="")
+            row = col.row(align=True)
+            row.operator("import_assets.swap_texture_resolution", text="Full Res").is_full_res = True
+            row.operator("import_assets.swap_texture_resolution", text="Proxies").is_full_res = False
+        col.prop(props, "worker_count", text="Workers")
+        col.prop(props, "use_bulk_mode", text="Bulk Mode")
+        if props.use_bulk_mode:
+            info = col.column(align=True)
+            info.scale_y = 0.8
+            info.label(text="Undo is off during the import,", icon="INFO")
+            info.label(text="it can't be undone.")
+        col.prop(props, "preview_backend", text="Previews")
+        if props.preview_backend == "WORKERS":
+            col.prop(props, "preview_engine", text="Engine")
+            col.prop(props, "preview_size", text="Size")
+            col.prop(props, "preview_worker_count", text="Preview Workers")
+        else:
+            col.prop(props, "preview_batch_size", text="Preview Batch")
+        if props.is_save_blend_file:
+            col.prop(props, "is_save_after_previews", text="Save After Previews")
+        col.prop(props, "is_write_report", text="Write Report")
+        if props.is_write_report:
+            col.prop(props, "profiled_stage", text="Profile")
+        if props.worker_count == 1:
+            col.prop(props, "chunk_size", text="Chunk Size")
+            col.prop(props, "checkpoint_interval", text="Checkpoint Every")
+
+        if wm_props.is_generating_previews:
             box = layout.box()
             col = box.column(align=True)
-            col.label(text="Assets previews are ", icon="INFO")
-            col.label(text="being generated. Please wait")
-            col.label(text="a while and save the file")
-            col.label(text="again to keep the previews.")
+            col.label(text=f"Previews: {wm_props.preview_done}/{wm_props.preview_total}", icon="INFO")
+            if props.is_save_blend_file and props.is_save_after_previews:
+                col.label(text="The file is saved when done.")
+            else:
+                col.label(text="Save the file when done")
+                col.label(text="to keep the previews.")
+            col.operator("import_assets.cancel_previews", text="Cancel Previews", icon="CANCEL")
         
+        if wm_props.stage_timings:
+            box = layout.box()
+            row = box.row(align=True)
+            row.alignment = "LEFT"
+            row.prop(
+                wm_props, "is_expand_timings", text=f"Last Import: {wm_props.total_seconds:.1f}s",
+                icon="TRIA_DOWN" if wm_props.is_expand_timings else "TRIA_RIGHT", emboss=False
+            )
+            if wm_props.is_expand_timings:
+                col = box.column(align=True)
+                for timing in wm_props.stage_timings:
+                    row = col.row()
+                    row.label(text=timing.name)
+                    row.label(text=f"{timing.seconds:.2f}s ({timing.calls})")
+                if wm_props.report_path:
+                    col.label(text=os.path.basename(wm_props.report_path), icon="FILE_TEXT")
+
         box = layout.box()
         col = box.column(align=True)
         col.label(text="Model Asset Type:")
         row = col.row(align=True)
         row.prop(props, "asset_type", expand=True)
+        col.label(text="Catalogs:")
+        row = col.row(align=True)
+        row.prop(props, "catalog_hierarchy", expand=True)
+        if props.catalog_hierarchy == "TOKENS":
+            col.prop(props, "catalog_token_separators", text="Separators")
+        if props.catalog_hierarchy != "FLAT":
+            col.prop(props, "catalog_depth", text="Max Depth")
 
         row = layout.row()
         row.scale_y = 2.0
@@ -278,6 +680,7 @@ class BIA_PT_main_panel(bpy.types.Panel):
 
 classes = (
     TextureMappingNamesProperties,
+    BatchImportStageTiming,
     BatchImportAssetsWMProperties,
     BatchImportAssetsProperties,
     BIA_PT_main_panel
@@ -295,6 +698,8 @@ def register():
 
 
 def unregister():
+    previews.cancel_previews()
+
     for cls in classes:
         bpy.utils.unregister_class(cls)
 
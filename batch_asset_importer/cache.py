@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+"""A module for the persistent fingerprint cache that drives incremental re-imports"""
+
+
+CACHE_FILE_NAME = "blender_assets.import_cache.json"
+CACHE_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE) -> str:
+    """Hash the contents of a file, reading it in chunks so large files never have to fit in memory."""
+    file_hash = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class ImportCache:
+    """Represents the sidecar file storing the fingerprints of every asset folder imported into a library.
+
+    Fingerprints are stored per source root, so importing several source folders into the same library
+    does not make one of them look deleted to the other. Every folder also stores the signature of the settings
+    it was imported with, so a folder that wasn't imported again after a settings change is still out of date.
+    """
+
+    def __init__(self, cache_dir, source_root, filename=""):
+        self.cache_file = Path(cache_dir) / (filename or CACHE_FILE_NAME)
+        self.source_root = os.path.normpath(source_root)
+        self.data = {"version": CACHE_VERSION, "roots": {}}
+        self.load()
+
+    @property
+    def root(self) -> dict:
+        return self.data["roots"].setdefault(self.source_root, {"settings": "", "folders": {}})
+
+    @property
+    def folders(self) -> Dict[str, dict]:
+        return self.root["folders"]
+
+    def load(self):
+        """Read the cache from the disk, starting from scratch if it is missing or unreadable"""
+        if not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == CACHE_VERSION:
+            self.data = data
+            # Folders cached before the signatures were stored per folder were imported with the settings of the root
+            for root in self.data["roots"].values():
+                for entry in root["folders"].values():
+                    entry.setdefault("settings", root["settings"])
+
+    def write(self):
+        """Update the cache file on the disk"""
+        temp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        with open(temp_file, "w") as f:
+            json.dump(self.data, f, indent=1, sort_keys=True)
+        os.replace(temp_file, self.cache_file)
+
+    def update_settings(self, signature) -> bool:
+        """Store the signature of the current import settings, returning whether it changed since the last run. The
+        folders imported with other settings are reported as changed until they are imported again."""
+        changed = self.root["settings"] != signature
+        self.root["settings"] = signature
+        return changed
+
+    def is_folder_changed(self, asset_folder, use_content_hash=False) -> bool:
+        """Check whether an asset folder is new or was modified since it was last imported"""
+        entry = self.folders.get(asset_folder.path)
+        if entry is None or entry.get("settings") != self.root["settings"]:
+            return True
+
+        cached_files = entry["files"]
+        source_files = asset_folder.files
+        if set(cached_files) != {source_file.name for source_file in source_files}:
+            return True
+
+        for source_file in source_files:
+            size, mtime, content_hash = cached_files[source_file.name]
+            if size != source_file.size:
+                return True
+            if mtime == source_file.mtime:
+                continue
+            # The file was touched, but it may still have the same contents
+            if not use_content_hash or not content_hash or hash_file(source_file.path) != content_hash:
+                return True
+            cached_files[source_file.name][1] = source_file.mtime
+        return False
+
+    def update_folder(self, asset_folder, use_content_hash=False):
+        """Store the current fingerprint of an asset folder"""
+        self.folders[asset_folder.path] = {
+            "settings": self.root["settings"],
+            "files": {
+                source_file.name: [
+                    source_file.size,
+                    source_file.mtime,
+                    hash_file(source_file.path) if use_content_hash else "",
+                ]
+                for source_file in asset_folder.files
+            },
+        }
+
+    def get_removed_folders(self, manifest) -> List[str]:
+        """Get the cached asset folders that are no longer in the source tree"""
+        present = {asset_folder.path for asset_folder in manifest}
+        return [path for path in self.folders if path not in present]
+
+    def remove_folder(self, path):
+        self.folders.pop(path, None)
@@ -3,8 +3,12 @@
 
 from __future__ import annotations
 
+import os
+import time
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 from uuid import uuid4
 
 """A module for working with blender_assets.cats.txt files, and the asset catalogs that they contain"""
@@ -21,6 +25,61 @@ VERSION 1
 
 """
 
+# Seconds to wait for another process to release the catalog file, and after which a lock is considered stale
+LOCK_TIMEOUT = 30.0
+LOCK_STALE_AGE = 120.0
+
+
+class CatalogConflictError(Exception):
+    """Raised when a catalog path is already used by a catalog with a different UUID"""
+
+    def __init__(self, conflicts: List[CatalogConflict]):
+        self.conflicts = conflicts
+        super().__init__("Conflicting catalogs:\n" + "\n".join(str(conflict) for conflict in conflicts))
+
+
+@contextmanager
+def lock_file(path, timeout=LOCK_TIMEOUT, stale_age=LOCK_STALE_AGE):
+    """Hold a lock on a file across processes, using a lock file next to it"""
+    lock_path = f"{path}.lock"
+    start = time.monotonic()
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                # Left behind by a process that crashed while holding it
+                if time.time() - os.path.getmtime(lock_path) > stale_age:
+                    os.unlink(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.monotonic() - start > timeout:
+                raise TimeoutError(f"Could not lock {path}, remove {lock_path} if no other process is using it")
+            time.sleep(0.05)
+
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.unlink(lock_path)
+        except OSError:
+            pass
+
+
+class CatalogConflict:
+
+    def __init__(self, path, uuid, other_uuid):
+        self.path = path
+        self.uuid = uuid
+        self.other_uuid = other_uuid
+
+    def __str__(self):
+        return f"{self.path}: {self.uuid} (kept), {self.other_uuid}"
+
 
 class AssetCatalog:
 
@@ -34,12 +93,19 @@ class AssetCatalog:
 
 
 class AssetCatalogFile:
-    """Represents a file containing the catalog info for a blender asset library."""
+    """Represents a file containing the catalog info for a blender asset library.
+
+    Changes are only kept in memory, and marked as dirty, until they are written with `write` or `flush`."""
 
     def __init__(self, catalog_dir, filename="", load_from_file=True):
         # By default, use the normal catalog file name, but can also use a custom one
         self.catalog_file = Path(catalog_dir) / (filename or "blender_assets.cats.txt")
         self.catalogs = {}
+        self.is_dirty = False
+        # The UUIDs of the removed catalogs, so they aren't merged back from the file when writing
+        self.removed_uuids = set()
+        # The conflicts found by the last write, the catalogs already in the file were kept
+        self.conflicts: List[CatalogConflict] = []
         self.ensure_exists()
         if load_from_file:
             self.validate_file()
@@ -60,8 +126,9 @@ class AssetCatalogFile:
         return catalog_lines
 
     def validate_file(self):
-        """Ensure the file is in the correct format for processing."""
+        """Ensure the file is in the correct format for processing. It is only rewritten if a line was fixed."""
         new_lines = []
+        is_changed = False
 
         # Remove extra : symbols
         for line in self.get_catalog_lines():
@@ -69,37 +136,91 @@ class AssetCatalogFile:
                 parts = line.split(":")
                 new_line = ":".join([parts[0], ";".join(parts[1:-1]), parts[-1]])
                 new_lines.append(new_line)
+                is_changed = True
                 continue
             new_lines.append(line)
 
-        with open(self.catalog_file, "w") as f:
-            f.write(CATALOG_HEADER)
-            for line in new_lines:
-                f.write(line)
-
-    def write(self):
-        """Update the catalog file on the disk"""
-        out_string = CATALOG_HEADER
-        for catalog in self.catalogs.values():
-            out_string += f"{catalog.uuid}:{catalog.path}:{catalog.name}\n"
-        with open(self.catalog_file, "w") as f:
-            # f.write(CATALOG_HEADER)
-            f.write(out_string)
+        if is_changed:
+            self.write_file(CATALOG_HEADER + "".join(new_lines))
+
+    def write_file(self, text):
+        """Replace the file atomically, so that other processes never read a partially written file"""
+        fd, temp_path = tempfile.mkstemp(
+            dir=self.catalog_file.parent, prefix=f".{self.catalog_file.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            os.replace(temp_path, self.catalog_file)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def write(self, raise_on_conflict=False):
+        """Update the catalog file on the disk.
+
+        The file is locked, and the catalogs written by other processes since it was read are merged in by UUID.
+        If one of the catalogs has the same path as a different catalog in the file, the one in the file is kept
+        and the conflict is added to `conflicts`, or raised as a CatalogConflictError if `raise_on_conflict`."""
+        with lock_file(self.catalog_file):
+            self.ensure_exists()
+            on_disk = AssetCatalogFile(self.catalog_file.parent, self.catalog_file.name, load_from_file=False)
+            on_disk.validate_file()
+            on_disk.update_catalog_from_file()
+            for path, catalog in list(on_disk.catalogs.items()):
+                if catalog.uuid in self.removed_uuids:
+                    del on_disk.catalogs[path]
+
+            conflicts = on_disk.merge(self)
+            if conflicts and raise_on_conflict:
+                raise CatalogConflictError(conflicts)
+
+            out_string = CATALOG_HEADER + "".join(f"{catalog}\n" for catalog in on_disk.catalogs.values())
+            self.write_file(out_string)
+
+        self.catalogs = on_disk.catalogs
+        self.conflicts = conflicts
+        self.removed_uuids = set()
+        self.is_dirty = False
         return out_string
 
-    def merge(self, other_catalog: AssetCatalogFile):
-        """Combine two AssetCatalogFile objects, merging all entries"""
-        self.catalogs.update(other_catalog.catalogs)
+    def flush(self):
+        """Write the catalog file, only if the catalogs have changed since it was read or last written.
+        Returns whether the file was written."""
+        if not self.is_dirty:
+            return False
+        self.write()
+        return True
+
+    def merge(self, other_catalog: AssetCatalogFile) -> List[CatalogConflict]:
+        """Combine two AssetCatalogFile objects, merging all entries by UUID.
+
+        A catalog with the same UUID takes the path and name of the other one. A catalog of the other file whose
+        path is used by a catalog with a different UUID here isn't added, and is returned as a conflict."""
+        conflicts = []
+        paths_by_uuid = {catalog.uuid: path for path, catalog in self.catalogs.items()}
+        for catalog in other_catalog.catalogs.values():
+            existing = self.catalogs.get(catalog.path)
+            if existing is not None and existing.uuid != catalog.uuid:
+                conflicts.append(CatalogConflict(catalog.path, existing.uuid, catalog.uuid))
+                continue
+            old_path = paths_by_uuid.get(catalog.uuid)
+            if old_path is not None and old_path != catalog.path:
+                del self.catalogs[old_path]
+            self.catalogs[catalog.path] = AssetCatalog(catalog.uuid, catalog.path, catalog.name)
+            paths_by_uuid[catalog.uuid] = catalog.path
+            self.is_dirty = True
+        return conflicts
 
     def ensure_exists(self):
         """Ensure that this catalog file exists"""
         if not self.catalog_file.exists():
-            with open(self.catalog_file, "w") as f:
-                f.write(CATALOG_HEADER)
+            self.write_file(CATALOG_HEADER)
 
     def update_catalog_from_file(self):
         """Read and set the catalogs from the file"""
         self.catalogs = self.get_catalogs_from_file()
+        self.is_dirty = False
 
     def get_catalogs_from_file(self) -> Dict[str, AssetCatalog]:
         """Read the catalogs from the file"""
@@ -109,7 +230,7 @@ class AssetCatalogFile:
                 if line.startswith(("#", "VERSION", "\n")):
                     continue
                 try:
-                    catalog = AssetCatalog(*line.split(":"))
+                    catalog = AssetCatalog(*line.rstrip("\n").split(":"))
                 except Exception as e:
                     raise Exception(f"Error parsing line: {line}\n") from e
                 catalogs[catalog.path] = catalog
@@ -117,7 +238,9 @@ class AssetCatalogFile:
 
     def reset(self):
         """Remove all catalogs"""
+        self.removed_uuids.update(catalog.uuid for catalog in self.catalogs.values())
         self.catalogs = {}
+        self.is_dirty = True
 
     def add_catalog(self, name, path: str = "", uuid: str = ""):
         """Add a catalog"""
@@ -125,13 +248,28 @@ class AssetCatalogFile:
         path = path or name
 
         self.catalogs[path] = AssetCatalog(uuid, path, name)
+        self.is_dirty = True
 
     def remove_catalog(self, path):
         """Remove a catalog"""
-        del self.catalogs[path]
+        self.removed_uuids.add(self.catalogs.pop(path).uuid)
+        self.is_dirty = True
+
+    def get_uuid(self, path) -> str:
+        """Get the UUID of the catalog with the given path, or an empty string if there is none"""
+        catalog = self.catalogs.get(path)
+        return catalog.uuid if catalog is not None else ""
+
+    def ensure_catalog_path_exists(self, path) -> AssetCatalog:
+        """Ensure that a catalog and all of its parent catalogs exist, named after their paths like "A-B-C"."""
+        parts = path.split("/")
+        for i in range(1, len(parts) + 1):
+            catalog = self.ensure_catalog_exists("-".join(parts[:i]), "/".join(parts[:i]))
+        return catalog
 
     def ensure_catalog_exists(self, name, path=""):
         """Ensure that a catalog exists, and if it doesn't, create one."""
         path = path or name
-        if name not in self.catalogs:
+        if path not in self.catalogs:
             self.add_catalog(name, path)
+        return self.catalogs[path]
@@ -0,0 +1,148 @@
+"""Command line entry point, for running batch imports in background Blender sessions (CI, render farms).
+
+Usage:
+    blender -b [library.blend] --python path/to/batch_asset_importer/cli.py -- --folder-path SOURCE [options]
+    blender -b [library.blend] --python-expr "import batch_asset_importer.cli as c; c.main()" -- [options]
+
+Every setting of the N-panel is available as an option, run with "-- --help" to list them. The summary
+of the run (counts, timings and failures) is printed as a single JSON line starting with BIA_SUMMARY,
+and can also be written to a file with --summary. The exit code is 0 on success, 1 if some asset
+folders failed to import and 2 for invalid arguments.
+"""
+
+import bpy
+import os
+import sys
+import json
+import argparse
+import importlib
+import traceback
+
+
+SUMMARY_PREFIX = "BIA_SUMMARY "
+
+# Properties that only affect the UI
+IGNORED_PROPERTIES = {"is_expand_map_settings"}
+
+CLI_ONLY_ARGUMENTS = {"output", "summary"}
+
+PROPERTY_ALIASES = {
+    "worker_count": ["--workers"],
+}
+
+
+def parse_bool(value):
+    value = value.lower()
+    if value in {"1", "true", "yes", "on"}:
+        return True
+    if value in {"0", "false", "no", "off"}:
+        return False
+    raise argparse.ArgumentTypeError(f"Invalid boolean value: {value}")
+
+
+def add_property_arguments(parser, bl_rna, path=()):
+    """Add an option for every property of a property group, recursing into the nested groups"""
+    for prop in bl_rna.properties:
+        if prop.identifier == "rna_type" or prop.identifier in IGNORED_PROPERTIES:
+            continue
+        prop_path = path + (prop.identifier,)
+        if prop.type == "POINTER":
+            add_property_arguments(parser, prop.fixed_type, prop_path)
+            continue
+
+        option = "--" + "-".join(prop_path).replace("_", "-").replace("map-names-", "map-")
+        kwargs = {"dest": ".".join(prop_path), "default": None, "help": prop.description or prop.name}
+        if prop.type == "BOOLEAN":
+            kwargs.update(type=parse_bool, metavar="BOOL")
+        elif prop.type == "INT":
+            kwargs.update(type=int)
+        elif prop.type == "FLOAT":
+            kwargs.update(type=float)
+        elif prop.type == "ENUM":
+            kwargs.update(choices=[item.identifier for item in prop.enum_items])
+        parser.add_argument(option, *PROPERTY_ALIASES.get(prop.identifier, []), **kwargs)
+
+
+def get_parser(props):
+    parser = argparse.ArgumentParser(
+        prog="blender -b [library.blend] --python cli.py --",
+        description="Batch import all the mesh files and texture sets in a folder into an asset library.",
+    )
+    parser.add_argument(
+        "--output",
+        help="The library .blend file to import into. It is opened if it exists, and created otherwise. "
+             "Defaults to the file opened by Blender"
+    )
+    parser.add_argument("--summary", help="Also write the JSON summary of the run to this file")
+    add_property_arguments(parser, props.bl_rna)
+    return parser
+
+
+def get_script_args():
+    return sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+
+def apply_arguments(props, args):
+    for dest, value in vars(args).items():
+        if dest in CLI_ONLY_ARGUMENTS or value is None:
+            continue
+        *path, identifier = dest.split(".")
+        owner = props
+        for name in path:
+            owner = getattr(owner, name)
+        setattr(owner, identifier, value)
+
+
+def open_library_file(output):
+    if output:
+        output = os.path.abspath(output)
+        if os.path.exists(output) and output != os.path.abspath(bpy.data.filepath or ""):
+            bpy.ops.wm.open_mainfile(filepath=output)
+            return
+    if not bpy.data.filepath:
+        # Don't import into the default startup scene
+        bpy.ops.wm.read_homefile(use_empty=True)
+    if output:
+        bpy.ops.wm.save_as_mainfile(filepath=output)
+
+
+def main():
+    # This module may be run as a script, so the rest of the add-on is only imported here
+    from . import register
+    from .pipeline import ImportPipeline
+
+    if not hasattr(bpy.types.Scene, "batch_import_assets_props"):
+        register()
+
+    parser = get_parser(bpy.context.scene.batch_import_assets_props)
+    args = parser.parse_args(get_script_args())
+
+    if not args.output and not bpy.data.filepath:
+        parser.error("--output is required when no .blend file is opened")
+    open_library_file(args.output)
+
+    props = bpy.context.scene.batch_import_assets_props
+    apply_arguments(props, args)
+    props.folder_path = os.path.abspath(bpy.path.abspath(props.folder_path)) if props.folder_path else ""
+    if not os.path.isdir(props.folder_path):
+        parser.error(f"The folder path is not a directory: {props.folder_path!r}")
+
+    try:
+        summary = ImportPipeline(bpy.context).run()
+    except Exception:
+        summary = {"error": traceback.format_exc()}
+
+    print(SUMMARY_PREFIX + json.dumps(summary), flush=True)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    failed = "error" in summary or summary["counts"]["failed"] > 0
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    # Run as a script: import the add-on as a package from its parent folder
+    addon_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(addon_dir))
+    importlib.import_module(os.path.basename(addon_dir)).cli.main()
@@ -1,37 +1,142 @@
 import bpy
 import os
-from . import catalog
+import json
+import hashlib
+from collections import defaultdict
+from mathutils import Matrix
+from . import catalog, images, packing, profiling, scanner, textures
+
+
+# The folder of the texture proxies and packed textures, next to the blend file unless set in the panel
+TEXTURE_CACHE_FOLDER = "texture_proxies"
+
+# The output sockets of a Separate Color node, in the channel order of the packed maps
+PACKED_CHANNEL_SOCKETS = ("Red", "Green", "Blue")
+
+# Mesh format -> (import operator, profiling stage)
+MESH_IMPORTERS = {
+    "FBX": (lambda filepath: bpy.ops.import_scene.fbx(filepath=filepath), "fbx_import"),
+    "GLTF": (lambda filepath: bpy.ops.import_scene.gltf(filepath=filepath), "gltf_import"),
+    "OBJ": (lambda filepath: bpy.ops.wm.obj_import(filepath=filepath), "obj_import"),
+    "USD": (lambda filepath: bpy.ops.wm.usd_import(filepath=filepath), "usd_import"),
+}
+
+# ID property storing the source asset folder of the data-blocks created by an import
+SOURCE_FOLDER_KEY = "bia_source_folder"
+# ID property storing the level of the LOD objects and meshes
+LOD_LEVEL_KEY = "bia_lod_level"
+# ID property set on the objects marked as assets, which is much cheaper to check than their collections
+POST_PROCESSED_KEY = "bia_post_processed"
+
+# The property toggling the use of each map type in the materials
+MAP_USE_PROPERTIES = {
+    "base_color": "use_diffuse",
+    "ao": "use_ao",
+    "metallic": "use_metallic",
+    "roughness": "use_roughness",
+    "glossy": "use_roughness",
+    "normal": "use_normal",
+    "bump": "use_bump",
+    "displacement": "use_displacement",
+    "opacity": "use_opacity",
+    "emissive": "use_emissive",
+    "specular": "use_specular",
+}
+
+# Properties that don't change the result of importing an asset folder
+SETTINGS_SIGNATURE_IGNORED = {
+    "folder_path",
+    "main_collection_name",
+    "is_save_blend_file",
+    "is_expand_map_settings",
+    "is_expand_name_settings",
+    "is_incremental",
+    "use_content_hash",
+    "worker_count",
+    "chunk_size",
+    "checkpoint_interval",
+    "use_image_deduplication",
+    "use_mesh_deduplication",
+    "is_lazy_textures",
+    "use_material_templates",
+    "texture_proxy_folder",
+    "is_write_report",
+    "use_bulk_mode",
+    "preview_backend",
+    "preview_engine",
+    "preview_size",
+    "preview_worker_count",
+    "preview_batch_size",
+    "is_save_after_previews",
+    "profiled_stage",
+}
+
+
+def create_image_cache(asset_folders):
+    props = bpy.context.scene.batch_import_assets_props
+    if not props.use_image_deduplication:
+        return None
+    return images.ImageCache(
+        texture_file for asset_folder in asset_folders for texture_file in asset_folder.textures.values()
+    )
 
 
-def import_fbx_files_and_textures(folder_path):
+def scan_source_folder(folder_path):
     props = bpy.context.scene.batch_import_assets_props
+    return scanner.scan_folder(folder_path, get_texture_classifier(), props.mesh_format_order)
 
-    for root, dirs, files in os.walk(folder_path):
-        for dir in dirs:
-            # Check if FBX file exists in the current folder
-            fbx_path = ""
-            for file in os.listdir(os.path.join(root, dir)):
-                if file.endswith(".fbx"):
-                    fbx_path = os.path.join(root, dir, file)
-                    break
-            if props.is_import_textures:
-                mat = create_material(dir)
-                mat.use_fake_user = True
-                textures = import_textures_from_folder(os.path.join(root, dir))
-                assign_textures_to_material(mat, textures)
-            if props.is_import_fbx and os.path.isfile(fbx_path):
-                bpy.ops.import_scene.fbx(filepath=fbx_path)
-                assign_material_to_selected_objects(mat)
 
+def import_fbx_files_and_textures(manifest, image_cache=None, material_templates=None):
+    """Import the asset folders, returning the objects created by the mesh imports"""
+    props = bpy.context.scene.batch_import_assets_props
 
-def assign_material_to_selected_objects(material):
-    for obj in bpy.context.selected_objects:
+    created_objects = []
+    for asset_folder in manifest:
+        mat = None
+        if props.is_import_textures:
+            with profiling.stage("texture_load", asset_folder.path):
+                textures = import_textures_from_folder(asset_folder, image_cache)
+            with profiling.stage("material_build", asset_folder.path):
+                if material_templates is not None and asset_folder.name not in bpy.data.materials:
+                    mat = material_templates.instantiate(asset_folder.name, textures)
+                else:
+                    mat = create_material(asset_folder.name)
+                    assign_textures_to_material(mat, textures)
+                mat.use_fake_user = True
+                mat[SOURCE_FOLDER_KEY] = asset_folder.path
+        if props.is_import_fbx and asset_folder.mesh_files:
+            with profiling.stage("mesh_import", asset_folder.path):
+                objects_before = set(bpy.data.objects)
+                for mesh_file in asset_folder.mesh_files:
+                    import_mesh_file(mesh_file, asset_folder.path)
+                new_objects = [obj for obj in bpy.data.objects if obj not in objects_before]
+            for obj in new_objects:
+                obj[SOURCE_FOLDER_KEY] = asset_folder.path
+            created_objects += new_objects
+            if mat is not None:
+                assign_material_to_objects(mat, new_objects)
+    return created_objects
+
+
+def import_mesh_file(mesh_file, asset=None):
+    """Import a mesh file with the importer of its format, timed in the stage of the format"""
+    import_operator, stage_name = MESH_IMPORTERS[scanner.get_mesh_format(mesh_file.name)]
+    with profiling.stage(stage_name, asset):
+        import_operator(mesh_file.path)
+
+
+def assign_material_to_objects(material, objects):
+    for obj in objects:
         if obj.type != "MESH":
             continue
         obj.data.materials.clear()
         obj.data.materials.append(material)
 
 
+def assign_material_to_selected_objects(material):
+    assign_material_to_objects(material, bpy.context.selected_objects)
+
+
 def assign_textures_to_material(material, textures):
     props = bpy.context.scene.batch_import_assets_props
     map_names = props.map_names
@@ -64,10 +169,14 @@ def assign_textures_to_material(material, textures):
         "bump": None,
     }
 
-    has_roughness = map_names.roughness in textures
+    # The maps only found in the channels of a packed texture are used like separate ones
+    packed_channels = get_packed_channels(textures)
+    available = set(textures) | set(packed_channels)
+
+    has_roughness = map_names.roughness in available
     has_glossy = map_names.glossy in textures and props.use_roughness
     has_diffuse = map_names.base_color in textures and props.use_diffuse
-    has_ao = map_names.ao in textures and props.use_ao
+    has_ao = map_names.ao in available and props.use_ao
     has_normal = map_names.normal in textures and props.use_normal
     has_bump = map_names.bump in textures and props.use_bump
     has_displacement = map_names.displacement in textures and props.use_displacement
@@ -97,7 +206,7 @@ def assign_textures_to_material(material, textures):
     normal_target = n_bump if has_bump else n_princ
 
     for texture_type, texture in textures.items():
-        if texture_type != map_names.base_color and texture_type != map_names.emissive:
+        if not is_color_texture_type(texture_type) and texture.colorspace_settings.name != "Non-Color":
             texture.colorspace_settings.name = "Non-Color"
 
         if texture_type == map_names.base_color and props.use_diffuse:
@@ -171,8 +280,55 @@ def assign_textures_to_material(material, textures):
             node_tree.links.new(n_tex.outputs["Color"], n_bump.inputs["Height"])
             node_tree.links.new(n_bump.outputs["Normal"], n_princ.inputs["Normal"])
 
+    # A single image node per packed texture, split into its channels
+    packed_targets = defaultdict(list)
+    for map_type, (packed_type, socket) in packed_channels.items():
+        if map_type == map_names.ao and has_ao and has_diffuse:
+            packed_targets[packed_type].append((socket, n_mix_ao.inputs["Color2"]))
+        elif map_type == map_names.metallic and props.use_metallic:
+            packed_targets[packed_type].append((socket, n_princ.inputs["Metallic"]))
+        elif map_type == map_names.roughness and props.use_roughness:
+            packed_targets[packed_type].append((socket, n_princ.inputs["Roughness"]))
+
+    for packed_type, targets in packed_targets.items():
+        n_tex = nodes.new("ShaderNodeTexImage")
+        n_tex.image = textures[packed_type]
+        primary_nodes[packed_type] = n_tex
+        n_separate = nodes.new("ShaderNodeSeparateColor")
+        secondary_nodes[f"separate_{packed_type}"] = n_separate
+        node_tree.links.new(n_tex.outputs["Color"], n_separate.inputs["Color"])
+        for socket, target in targets:
+            node_tree.links.new(n_separate.outputs[socket], target)
+
     position_nodes(primary_nodes, secondary_nodes, tertiary_nodes, n_princ)
 
+    for texture_type, n_tex in primary_nodes.items():
+        if n_tex is not None:
+            n_tex.name = get_image_node_name(texture_type)
+
+
+def get_packed_channels(texture_types):
+    """Map type -> (packed map type, Separate Color output) of the maps only found in a packed texture.
+    A separate file of a map takes precedence over the channel of a packed one."""
+    map_names = bpy.context.scene.batch_import_assets_props.map_names
+    channels = {}
+    for texture_type in texture_types:
+        layout = textures.get_packed_layout(texture_type)
+        if layout is None:
+            continue
+        for field, socket in zip(layout, PACKED_CHANNEL_SOCKETS):
+            # A channel without a source map only holds a default value
+            if field is None:
+                continue
+            map_type = getattr(map_names, field)
+            if map_type not in texture_types:
+                channels.setdefault(map_type, (texture_type, socket))
+    return channels
+
+
+def get_image_node_name(texture_type):
+    return f"BIA {texture_type}"
+
 
 def position_nodes(primary_nodes, secondary_nodes, tertiary_nodes, n_princ):
     props = bpy.context.scene.batch_import_assets_props
@@ -209,6 +365,8 @@ def position_nodes(primary_nodes, secondary_nodes, tertiary_nodes, n_princ):
     if len(valid_tertiary_nodes) > 0:
         x_factor += 1
 
+    # The packed textures come after the single maps
+    map_order += [map_name for map_name in primary_nodes if map_name not in map_order]
     for map_name in map_order:
         if primary_nodes[map_name] is None:
             continue
@@ -230,7 +388,8 @@ def position_nodes(primary_nodes, secondary_nodes, tertiary_nodes, n_princ):
         if node is None:
             continue
         if node_name == "mix_rgb":
-            n_ao = primary_nodes[map_names.ao]
+            # The AO may be a channel of a packed texture, without an image node of its own
+            n_ao = primary_nodes[map_names.ao] or primary_nodes[map_names.base_color]
             node.location = (n_ao.location[0] + x_offset * x_factor, n_ao.location[1] + y_offset / 1.5)
         elif node_name == "invert_gloss":
             n_glossy = primary_nodes[map_names.glossy]
@@ -241,45 +400,67 @@ def position_nodes(primary_nodes, secondary_nodes, tertiary_nodes, n_princ):
         elif node_name == "displacement":
             n_disp = primary_nodes[map_names.displacement]
             node.location = (n_disp.location[0] + x_offset * x_factor, n_disp.location[1])
+        elif node_name.startswith("separate_"):
+            n_packed = primary_nodes[node_name[len("separate_"):]]
+            node.location = (n_packed.location[0] + x_offset * x_factor, n_packed.location[1])
+
+
+def is_color_texture_type(texture_type):
+    map_names = bpy.context.scene.batch_import_assets_props.map_names
+    return texture_type == map_names.base_color or texture_type == map_names.emissive
 
 
-def import_textures_from_folder(textures_folder):
+def is_texture_type_used(texture_type):
+    props = bpy.context.scene.batch_import_assets_props
+    layout = textures.get_packed_layout(texture_type)
+    if layout is not None:
+        return any(getattr(props, MAP_USE_PROPERTIES[field]) for field in layout if field is not None)
+    for field, use_property in MAP_USE_PROPERTIES.items():
+        if getattr(props.map_names, field) == texture_type:
+            return getattr(props, use_property)
+    return False
+
+
+def import_textures_from_folder(asset_folder, image_cache=None):
+    props = bpy.context.scene.batch_import_assets_props
+
+    texture_files = asset_folder.textures
+    if props.use_texture_packing:
+        with profiling.stage("texture_packing", asset_folder.path):
+            texture_files = packing.get_packed_texture_files(
+                asset_folder, get_texture_cache_folder_path(), props.map_names
+            )
+
     textures = {}
-    for texture_file in os.listdir(textures_folder):
-        texture_path = os.path.join(textures_folder, texture_file)
-        if not texture_file.endswith((".png", ".jpg", ".jpeg", ".tga", ".bmp", ".tif", ".tiff")):
-            continue
-        image = bpy.data.images.load(texture_path, check_existing=True)
-        texture_type = get_texture_type(texture_file)
-        if not texture_type:
+    for texture_type, texture_file in texture_files.items():
+        # In lazy mode, the maps that are turned off don't get an image at all
+        if props.is_lazy_textures and not is_texture_type_used(texture_type):
             continue
+        proxy_file = asset_folder.proxy_files.get(texture_file.path)
+        source_file = proxy_file or texture_file
+        if image_cache is not None:
+            image = image_cache.load(source_file)
+        else:
+            image = bpy.data.images.load(source_file.path, check_existing=True)
+        if proxy_file is not None:
+            # Keep the full resolution path, to swap the proxy for it later
+            image[images.FULL_RES_PATH_KEY] = texture_file.path
+            image[images.PROXY_PATH_KEY] = proxy_file.path
+        if props.is_lazy_textures and not is_color_texture_type(texture_type):
+            # Set the color space before anything uses the image, so its pixels are never read twice
+            if image.colorspace_settings.name != "Non-Color":
+                image.colorspace_settings.name = "Non-Color"
         textures[texture_type] = image
     return textures
 
 
-def get_texture_type(texture_name):
+def get_texture_classifier():
     props = bpy.context.scene.batch_import_assets_props
-    names = props.map_names
-
-    name_mappings = {
-        names.base_color: ["basecolor", "albedo", "diffuse", "color", "col"],
-        names.ao: ["ao", "ambientocclusion"],
-        names.metallic: ["metallic", "metal", "metalness"],
-        names.roughness: ["roughness", "rough"],
-        names.glossy: ["glossy", "gloss"],
-        names.normal: ["normal", "nor"],
-        names.bump: ["bump"],
-        names.displacement: ["displacement", "disp"],
-        names.opacity: ["opacity", "alpha"],
-        names.emissive: ["emissive", "emit"],
-        names.specular: ["specular", "spec"],
-    }
+    return textures.TextureClassifier.from_props(props.map_names)
 
-    for key, values in name_mappings.items():
-        identifier = texture_name.split("_")[-1].split(".")[0]
-        if identifier.lower() in values:
-            return key
-    return None
+
+def get_texture_type(texture_name):
+    return get_texture_classifier().classify(texture_name)
 
 
 def create_material(material_name):
@@ -319,65 +500,175 @@ def clear_parent(obj):
     return obj
 
 
-def clear_parents_and_keep_transform():
-    for obj in bpy.context.view_layer.objects:
+# The post-processing functions below work on the given objects, e.g. the ones created by an import, or on all
+# the objects of the view layer if none are given
+def get_objects(objects=None):
+    return list(bpy.context.view_layer.objects) if objects is None else objects
+
+
+def clear_parents_and_keep_transform(objects=None):
+    for obj in get_objects(objects):
         clear_parent_and_keep_transform(obj)
 
 
-def clear_parents_of_all_objects():
-    for obj in bpy.context.view_layer.objects:
+def clear_parents_of_all_objects(objects=None):
+    for obj in get_objects(objects):
         clear_parent(obj)
 
 
-def delete_empties():
-    for obj in bpy.context.view_layer.objects:
-        if obj.type == "EMPTY":
-            bpy.data.objects.remove(obj)
+def delete_empties(objects=None):
+    """Delete the empties, returning the remaining objects"""
+    remaining = []
+    empties = []
+    for obj in get_objects(objects):
+        (empties if obj.type == "EMPTY" else remaining).append(obj)
+    bpy.data.batch_remove(empties)
+    return remaining
+
+
+def apply_transform_to_mesh(mesh, matrix):
+    mesh.transform(matrix, shape_keys=True)
+    # A negative scale turns the faces inside out
+    if matrix.determinant() < 0:
+        mesh.flip_normals()
+
+
+def apply_all_transforms(objects=None):
+    """Bake the transforms of the mesh objects into their meshes, without the transform_apply operator (which
+    needs the objects to be selected and in the view layer, and pushes an undo step)"""
+    objects_by_mesh = defaultdict(list)
+    for obj in get_objects(objects):
+        if obj.type == "MESH":
+            objects_by_mesh[obj.data].append(obj)
+
+    identity = Matrix.Identity(4)
+    for mesh, users in objects_by_mesh.items():
+        matrix = users[0].matrix_world.copy()
+        is_only_user = mesh.users == len(users)
+        if is_only_user and all(obj.matrix_world == matrix for obj in users[1:]):
+            # All the users have the same transform, so the mesh can stay shared
+            apply_transform_to_mesh(mesh, matrix)
+            for obj in users:
+                obj.matrix_world = identity
+            continue
 
+        # Otherwise every user gets its own copy, except the first one if the mesh isn't used anywhere else
+        for i, obj in enumerate(users):
+            if i > 0 or not is_only_user:
+                obj.data = mesh.copy()
+            apply_transform_to_mesh(obj.data, obj.matrix_world)
+            obj.matrix_world = identity
 
-def apply_all_transforms():
-    for obj in bpy.context.view_layer.objects:
-        obj.select_set(True)
-    bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
 
+def is_object_marked_as_asset(obj):
+    if obj.asset_data is not None:
+        return True
+    return any(col.asset_data is not None for col in obj.users_collection)
 
-def mark_all_objects_as_asset(meshes_catalog_uuid):
+
+def is_object_post_processed(obj):
+    if POST_PROCESSED_KEY in obj:
+        return True
+    # Objects marked before the property existed get it on their first check
+    if is_object_marked_as_asset(obj):
+        obj[POST_PROCESSED_KEY] = True
+        return True
+    return False
+
+
+def mark_all_objects_as_asset(
+    meshes_catalog_uuid, generate_previews=True, folder_catalogs=None, objects=None, lod_objects=None
+):
+    """Mark the mesh objects as assets. lod_objects maps an object to its LOD objects, which are added to its
+    asset collection in collection mode."""
     props = bpy.context.scene.batch_import_assets_props
-    objects = list(bpy.context.view_layer.objects)
+    objects = get_objects(objects)
     i = 0
     for obj in objects:
         i += 1
         print("Total Objects: ", len(objects))
         print(f"Processing: {obj.name}")
         print(f"Progress: {i}/{len(objects)}")
-        if obj.type != "MESH":
+        if obj.type != "MESH" or is_object_marked_as_asset(obj):
             continue
         # First create a collection for the asset
         if props.asset_type == "COLLECTION":
             col = bpy.data.collections.new(obj.name)
+            if SOURCE_FOLDER_KEY in obj:
+                col[SOURCE_FOLDER_KEY] = obj[SOURCE_FOLDER_KEY]
             main_collection = get_main_collection()
             main_collection.children.link(col)
 
-            for parent_col in obj.users_collection:
-                parent_col.objects.unlink(obj)
-            col.objects.link(obj)
+            # The LOD objects are children of the object, and part of its asset
+            for asset_obj in [obj, *(lod_objects or {}).get(obj, ())]:
+                for parent_col in asset_obj.users_collection:
+                    parent_col.objects.unlink(asset_obj)
+                col.objects.link(asset_obj)
 
             col.asset_mark()
-            col.asset_generate_preview()
-            col.asset_data.catalog_id = meshes_catalog_uuid
+            obj[POST_PROCESSED_KEY] = True
+            if generate_previews:
+                with profiling.stage("preview_generation"):
+                    col.asset_generate_preview()
+            col.asset_data.catalog_id = get_asset_catalog_uuid(obj, meshes_catalog_uuid, folder_catalogs, 0)
         else:
             obj.asset_mark()
-            obj.asset_generate_preview()
-            obj.asset_data.catalog_id = meshes_catalog_uuid
+            obj[POST_PROCESSED_KEY] = True
+            if generate_previews:
+                with profiling.stage("preview_generation"):
+                    obj.asset_generate_preview()
+            obj.asset_data.catalog_id = get_asset_catalog_uuid(obj, meshes_catalog_uuid, folder_catalogs, 0)
 
 
-def mark_unused_materials_as_asset(materials_catalog_uuid):
+def mark_unused_materials_as_asset(materials_catalog_uuid, generate_previews=True, folder_catalogs=None):
     for mat in bpy.data.materials:
-        if not mat.use_fake_user or mat.users != 1:
+        if not mat.use_fake_user or mat.users != 1 or mat.asset_data is not None:
             continue
         mat.asset_mark()
-        mat.asset_generate_preview()
-        mat.asset_data.catalog_id = materials_catalog_uuid
+        if generate_previews:
+            with profiling.stage("preview_generation"):
+                mat.asset_generate_preview()
+        mat.asset_data.catalog_id = get_asset_catalog_uuid(mat, materials_catalog_uuid, folder_catalogs, 1)
+
+
+#-----Orphan Purge Functions-----#
+# The data-blocks an import can create, which are removed after it if nothing uses them
+PURGEABLE_DATA = ("meshes", "materials", "images", "armatures", "actions", "lights", "cameras", "node_groups")
+
+
+def get_data_snapshot():
+    """Get the purgeable data-blocks that exist before an import"""
+    return {attr: set(getattr(bpy.data, attr)) for attr in PURGEABLE_DATA}
+
+
+def get_new_orphans(snapshot):
+    """Get the data-blocks created since the snapshot that are unused, or only used by other such data-blocks
+    (e.g. the materials of an unused mesh)"""
+    new_data = [
+        id_data for attr, before in snapshot.items() for id_data in getattr(bpy.data, attr) if id_data not in before
+    ]
+    orphans = {id_data for id_data in new_data if id_data.users == 0}
+    candidates = [id_data for id_data in new_data if id_data not in orphans and not id_data.use_fake_user]
+    if not candidates:
+        return orphans
+
+    user_map = bpy.data.user_map(subset=candidates)
+    is_changed = True
+    while is_changed:
+        is_changed = False
+        for id_data in candidates:
+            users = user_map.get(id_data)
+            if id_data not in orphans and users and users <= orphans:
+                orphans.add(id_data)
+                is_changed = True
+    return orphans
+
+
+def purge_new_orphans(snapshot):
+    """Remove the unused data-blocks created since the snapshot, leaving the rest of the file untouched"""
+    orphans = get_new_orphans(snapshot)
+    bpy.data.batch_remove(orphans)
+    return len(orphans)
 
 
 #-----Catalog Management Functions-----#
@@ -385,6 +676,14 @@ def get_blend_folder_path():
     return os.path.dirname(os.path.abspath(bpy.path.abspath(bpy.data.filepath)))
 
 
+def get_texture_cache_folder_path():
+    """The folder of the texture proxies and packed textures"""
+    props = bpy.context.scene.batch_import_assets_props
+    if props.texture_proxy_folder:
+        return os.path.abspath(bpy.path.abspath(props.texture_proxy_folder))
+    return os.path.join(get_blend_folder_path(), TEXTURE_CACHE_FOLDER)
+
+
 def create_catalog_file():
     catalog_file = catalog.AssetCatalogFile(get_blend_folder_path(), load_from_file=True)
     catalog_file.ensure_exists()
@@ -392,16 +691,42 @@ def create_catalog_file():
 
 
 def add_new_catalog(catalog_file, catalog_name, main_catalog_name="", is_main_catalog=False):
+    """Add the catalog if it doesn't exist yet, keeping the UUID of an existing one so its assets stay in it"""
     if is_main_catalog:
-        catalog_file.add_catalog(catalog_name)
-    else:
-        catalog_file.add_catalog(
-            f"{main_catalog_name}-{catalog_name}",
-            f"{main_catalog_name}/{catalog_name}") 
-    catalog_file.write()
+        return catalog_file.ensure_catalog_exists(catalog_name)
+    return catalog_file.ensure_catalog_exists(
+        f"{main_catalog_name}-{catalog_name}",
+        f"{main_catalog_name}/{catalog_name}")
 
 
-def get_catalogs(main_catalog_name):
+def get_catalog_path_parts(asset_folder):
+    """Get the nested catalog names of an asset folder, mirroring the source folders above it"""
+    props = bpy.context.scene.batch_import_assets_props
+    if props.catalog_hierarchy == "FLAT":
+        return []
+
+    parts = []
+    for folder_name in os.path.normpath(os.path.dirname(asset_folder.relative_path)).split(os.sep):
+        if folder_name in ("", "."):
+            continue
+        if props.catalog_hierarchy == "TOKENS":
+            # Folder names like "Vendor_Category" are split into nested catalogs
+            for separator in props.catalog_token_separators:
+                folder_name = folder_name.replace(separator, "/")
+            parts += folder_name.split("/")
+        else:
+            parts.append(folder_name)
+
+    # ":" separates the fields of the catalog file
+    parts = [part.strip().replace(":", "_") for part in parts if part.strip()]
+    if props.catalog_depth > 0:
+        parts = parts[:props.catalog_depth]
+    return parts
+
+
+def get_catalogs(main_catalog_name, asset_folders=()):
+    """Add the catalogs of the import, returning the UUIDs of the models and materials catalogs, and a map of
+    asset folder path -> (models UUID, materials UUID) for the asset folders in nested catalogs"""
     catalog_file = create_catalog_file()
 
     meshes_name = "Models"
@@ -411,17 +736,144 @@ def get_catalogs(main_catalog_name):
     add_new_catalog(catalog_file, main_catalog_name, is_main_catalog=True)
 
     # Add mesh catalog
-    add_new_catalog(catalog_file, meshes_name, main_catalog_name)
-    
+    meshes_catalog = add_new_catalog(catalog_file, meshes_name, main_catalog_name)
+
     # Add material catalog
-    add_new_catalog(catalog_file, materials_name, main_catalog_name)
-
-    meshes_uuid = ""
-    materials_uuid = ""
-    for path, catalog in catalog_file.catalogs.items():
-        if catalog.name == f"{main_catalog_name}-{meshes_name}":
-            meshes_uuid = catalog.uuid
-        elif catalog.name == f"{main_catalog_name}-{materials_name}":
-            materials_uuid = catalog.uuid
-    
-    return (meshes_uuid, materials_uuid)
+    materials_catalog = add_new_catalog(catalog_file, materials_name, main_catalog_name)
+
+    # Add the nested catalogs, once for each source folder containing asset folders
+    folder_catalog_paths = {}
+    catalog_paths = {}
+    for asset_folder in asset_folders:
+        parts = tuple(get_catalog_path_parts(asset_folder))
+        if not parts:
+            continue
+        paths = catalog_paths.get(parts)
+        if paths is None:
+            sub_path = "/".join(parts)
+            paths = catalog_paths[parts] = (
+                catalog_file.ensure_catalog_path_exists(f"{meshes_catalog.path}/{sub_path}").path,
+                catalog_file.ensure_catalog_path_exists(f"{materials_catalog.path}/{sub_path}").path,
+            )
+        folder_catalog_paths[asset_folder.path] = paths
+
+    # Write the file once, and only if a catalog was added. Another process may have added the same catalogs
+    # in the meantime, their UUIDs are the ones kept in the file
+    catalog_file.flush()
+    for conflict in catalog_file.conflicts:
+        print(f"Using the existing catalog {conflict}")
+
+    uuids = {}
+    folder_catalogs = {}
+    for folder_path, paths in folder_catalog_paths.items():
+        if paths not in uuids:
+            uuids[paths] = tuple(catalog_file.get_uuid(path) for path in paths)
+        folder_catalogs[folder_path] = uuids[paths]
+
+    return (catalog_file.get_uuid(meshes_catalog.path), catalog_file.get_uuid(materials_catalog.path),
+            folder_catalogs)
+
+
+def get_asset_catalog_uuid(id_data, default_uuid, folder_catalogs, index):
+    """Get the catalog of an asset from the asset folder it was imported from"""
+    if not folder_catalogs:
+        return default_uuid
+    uuids = folder_catalogs.get(id_data.get(SOURCE_FOLDER_KEY))
+    return uuids[index] if uuids else default_uuid
+
+
+#-----Incremental Import Functions-----#
+def props_to_dict(props):
+    values = {}
+    for prop in props.bl_rna.properties:
+        if prop.identifier == "rna_type":
+            continue
+        value = getattr(props, prop.identifier)
+        if prop.type == "POINTER":
+            values[prop.identifier] = props_to_dict(value)
+        elif getattr(prop, "is_array", False):
+            values[prop.identifier] = list(value)
+        else:
+            values[prop.identifier] = value
+    return values
+
+
+def props_from_dict(props, values):
+    for identifier, value in values.items():
+        if isinstance(value, dict):
+            props_from_dict(getattr(props, identifier), value)
+        else:
+            setattr(props, identifier, value)
+
+
+def get_settings_signature(props):
+    settings = props_to_dict(props)
+    for identifier in SETTINGS_SIGNATURE_IGNORED:
+        settings.pop(identifier, None)
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+def get_unmarked_imported_objects():
+    """Get the imported objects that were never post-processed, e.g. saved by a checkpoint of an interrupted import.
+    Empties are deleted and meshes are marked when post-processing, so these are the only types left over."""
+    return [
+        obj for obj in bpy.data.objects
+        if obj.type in {"MESH", "EMPTY"} and SOURCE_FOLDER_KEY in obj and obj.library is None
+        and LOD_LEVEL_KEY not in obj and not is_object_post_processed(obj)
+    ]
+
+
+def get_imported_folder_paths():
+    folder_paths = set()
+    for id_data in (*bpy.data.objects, *bpy.data.materials):
+        folder_path = id_data.get(SOURCE_FOLDER_KEY)
+        if folder_path:
+            folder_paths.add(folder_path)
+    return folder_paths
+
+
+def get_changed_asset_folders(import_cache, manifest):
+    props = bpy.context.scene.batch_import_assets_props
+    # The folders imported with other settings are changed folders for the cache
+    import_cache.update_settings(get_settings_signature(props))
+    imported_folder_paths = get_imported_folder_paths()
+
+    changed_folders = []
+    for asset_folder in manifest:
+        if (
+            asset_folder.path not in imported_folder_paths
+            or import_cache.is_folder_changed(asset_folder, props.use_content_hash)
+        ):
+            changed_folders.append(asset_folder)
+    return changed_folders
+
+
+def remove_asset_folder_data(folder_paths):
+    folder_paths = set(folder_paths)
+    if not folder_paths:
+        return
+    ids = [
+        id_data for id_data in (*bpy.data.objects, *bpy.data.collections, *bpy.data.materials)
+        if id_data.get(SOURCE_FOLDER_KEY) in folder_paths
+    ]
+    bpy.data.batch_remove(ids)
+
+
+def get_asset_folder_data(folder_paths):
+    """Get the (ID collection, name) of the objects, collections and materials imported from each of the given
+    folders, so they can be removed later without scanning the file again"""
+    folder_paths = set(folder_paths)
+    data = defaultdict(list)
+    if not folder_paths:
+        return data
+    for attr in ("objects", "collections", "materials"):
+        for id_data in getattr(bpy.data, attr):
+            folder_path = id_data.get(SOURCE_FOLDER_KEY)
+            if folder_path in folder_paths:
+                data[folder_path].append((attr, id_data.name))
+    return data
+
+
+def remove_named_data(data_names):
+    ids = (getattr(bpy.data, attr).get(name) for attr, name in data_names)
+    bpy.data.batch_remove([id_data for id_data in ids if id_data is not None])
@@ -0,0 +1,145 @@
+import bpy
+import os
+from collections import Counter, defaultdict
+
+from .cache import hash_file
+
+
+# ID properties storing the size, modification time and content hash of the file an image was loaded from
+FILE_SIZE_KEY = "bia_file_size"
+FILE_MTIME_KEY = "bia_file_mtime"
+CONTENT_HASH_KEY = "bia_content_hash"
+# ID properties storing the full resolution source and the proxy file of an image loaded from a proxy
+FULL_RES_PATH_KEY = "bia_full_res_path"
+PROXY_PATH_KEY = "bia_proxy_path"
+
+
+def free_image_buffers(image_names):
+    """Free the decoded pixels of the given images, they are read from their files again when needed"""
+    for name in image_names:
+        image = bpy.data.images.get(name)
+        if image is not None and image.has_data:
+            image.buffers_free()
+
+
+def swap_image_resolution(image, is_full_res):
+    """Point an image loaded from a proxy at its full resolution source, or back at the proxy"""
+    path = image.get(FULL_RES_PATH_KEY if is_full_res else PROXY_PATH_KEY)
+    if not path or not os.path.exists(path) or is_same_path(image.filepath, path):
+        return False
+    image.filepath = path
+    return True
+
+
+def is_same_path(image_filepath, path):
+    return os.path.normpath(bpy.path.abspath(image_filepath)) == os.path.normpath(path)
+
+
+class ImageCache:
+    """Loads texture images, reusing a single image data-block for all the files with identical contents.
+
+    Files are only hashed when another file or library image has the same size, so most textures are
+    never read at all. The hashes are stored on the images, so later imports can be matched against them, as long
+    as the size and modification time of their files still match the stored ones.
+    """
+
+    def __init__(self, source_files=()):
+        self.images_by_hash = {}
+        # Library images of a known file size that were never hashed
+        self.unhashed_images = defaultdict(list)
+        self.size_counts = Counter(source_file.size for source_file in source_files)
+        self.deduplicated_count = 0
+        self.bytes_saved = 0
+
+        for image in bpy.data.images:
+            size = image.get(FILE_SIZE_KEY)
+            if size is None:
+                continue
+            try:
+                stat = os.stat(bpy.path.abspath(image.filepath))
+            except OSError:
+                # The file is gone, so there is nothing to compare new files with
+                continue
+            if stat.st_size != size or stat.st_mtime != image.get(FILE_MTIME_KEY):
+                # The file changed since the image was loaded, the stored hash is stale
+                size = stat.st_size
+                image[FILE_SIZE_KEY] = size
+                image[FILE_MTIME_KEY] = stat.st_mtime
+                if CONTENT_HASH_KEY in image:
+                    del image[CONTENT_HASH_KEY]
+            content_hash = image.get(CONTENT_HASH_KEY)
+            if content_hash:
+                self.images_by_hash[content_hash] = image
+            else:
+                self.unhashed_images[size].append(image)
+            self.size_counts[size] += 1
+
+    def hash_library_images(self, size):
+        for image in self.unhashed_images.pop(size, []):
+            try:
+                content_hash = hash_file(bpy.path.abspath(image.filepath))
+            except OSError:
+                continue
+            image[CONTENT_HASH_KEY] = content_hash
+            self.images_by_hash.setdefault(content_hash, image)
+
+    def load(self, source_file):
+        content_hash = ""
+        if self.size_counts[source_file.size] > 1:
+            self.hash_library_images(source_file.size)
+            content_hash = hash_file(source_file.path)
+            image = self.images_by_hash.get(content_hash)
+            if image is not None and not is_same_path(image.filepath, source_file.path):
+                self.deduplicated_count += 1
+                self.bytes_saved += source_file.size
+                return image
+
+        image = bpy.data.images.load(source_file.path, check_existing=True)
+        image[FILE_SIZE_KEY] = source_file.size
+        image[FILE_MTIME_KEY] = source_file.mtime
+        if content_hash:
+            image[CONTENT_HASH_KEY] = content_hash
+            self.images_by_hash[content_hash] = image
+        return image
+
+    def deduplicate(self, images):
+        """Merge the images with identical contents among the given ones (e.g. appended from several files) and
+        the library images. The images are hashed when another given or library image has the same file size, as
+        a file appearing once in several shards was never hashed by the workers."""
+        images = [image for image in images if image.get(FILE_SIZE_KEY) is not None]
+        new_images = set(images)
+        # The given images may be in the cache already, when it was created after they were appended
+        for content_hash, image in list(self.images_by_hash.items()):
+            if image in new_images:
+                del self.images_by_hash[content_hash]
+        for library_images in self.unhashed_images.values():
+            library_images[:] = [image for image in library_images if image not in new_images]
+        library_sizes = {image[FILE_SIZE_KEY] for image in self.images_by_hash.values() if FILE_SIZE_KEY in image}
+        library_sizes.update(size for size, library_images in self.unhashed_images.items() if library_images)
+        sizes = Counter(image[FILE_SIZE_KEY] for image in images)
+
+        duplicates = []
+        for image in images:
+            size = image[FILE_SIZE_KEY]
+            if sizes[size] == 1 and size not in library_sizes:
+                continue
+            # The library images come first, so the existing images stay the originals
+            self.hash_library_images(size)
+            content_hash = image.get(CONTENT_HASH_KEY)
+            if not content_hash:
+                try:
+                    content_hash = hash_file(bpy.path.abspath(image.filepath))
+                except OSError:
+                    continue
+                image[CONTENT_HASH_KEY] = content_hash
+            original = self.images_by_hash.setdefault(content_hash, image)
+            if original == image:
+                continue
+            image.user_remap(original)
+            duplicates.append(image)
+            self.deduplicated_count += 1
+            self.bytes_saved += image.get(FILE_SIZE_KEY, 0)
+        bpy.data.batch_remove(duplicates)
+
+    def get_summary(self):
+        return {"deduplicated": self.deduplicated_count, "bytes_saved": self.bytes_saved}
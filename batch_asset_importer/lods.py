@@ -0,0 +1,119 @@
+import bpy
+import time
+
+from . import profiling
+from .functions import SOURCE_FOLDER_KEY, LOD_LEVEL_KEY
+
+
+# ID property of an object storing one of its LOD meshes, followed by the level
+LOD_MESH_KEY_PREFIX = "bia_lod_"
+
+DEFAULT_LOD_RATIOS = "0.5, 0.25, 0.1"
+
+
+def parse_lod_ratios(lod_ratios):
+    """Parse comma separated decimation ratios into the ratios of the LOD levels, from the most detailed one"""
+    ratios = set()
+    for value in lod_ratios.split(","):
+        try:
+            ratio = float(value)
+        except ValueError:
+            continue
+        if 0 < ratio < 1:
+            ratios.add(ratio)
+    return sorted(ratios, reverse=True)
+
+
+def decimate(obj, ratio, depsgraph):
+    """Get a decimated copy of the evaluated mesh of an object, leaving the object unchanged"""
+    modifier = obj.modifiers.new("BIA LOD", "DECIMATE")
+    modifier.ratio = ratio
+    try:
+        # Only the object tagged by the new modifier is evaluated
+        depsgraph.update()
+        return bpy.data.meshes.new_from_object(
+            obj.evaluated_get(depsgraph), preserve_all_data_layers=True, depsgraph=depsgraph
+        )
+    finally:
+        obj.modifiers.remove(modifier)
+
+
+def add_lod_objects(obj, lod_meshes):
+    """Add the LOD meshes as hidden child objects, which end up in the asset collection of the object. Returns
+    the LOD objects."""
+    lod_objects = []
+    for level, lod_mesh in enumerate(lod_meshes, 1):
+        lod = bpy.data.objects.new(f"{obj.name}_LOD{level}", lod_mesh)
+        lod[LOD_LEVEL_KEY] = level
+        if SOURCE_FOLDER_KEY in obj:
+            lod[SOURCE_FOLDER_KEY] = obj[SOURCE_FOLDER_KEY]
+        for collection in obj.users_collection:
+            collection.objects.link(lod)
+        # The materials of a deduplicated mesh are in object-level slots
+        for slot, lod_slot in zip(obj.material_slots, lod.material_slots):
+            if slot.link == "OBJECT":
+                lod_slot.link = "OBJECT"
+                lod_slot.material = slot.material
+        lod.parent = obj
+        lod.hide_viewport = True
+        lod.hide_render = True
+        lod_objects.append(lod)
+    return lod_objects
+
+
+def set_lod_meshes(obj, lod_meshes):
+    """Store the LOD meshes on the object, so they are appended along with it and can be swapped in"""
+    for level, lod_mesh in enumerate(lod_meshes, 1):
+        lod_mesh[LOD_LEVEL_KEY] = level
+        obj[f"{LOD_MESH_KEY_PREFIX}{level}"] = lod_mesh
+
+
+def generate_lods(objects, ratios, min_faces=0, as_objects=False):
+    """Generate the LOD levels of the mesh objects with at least min_faces faces, either as extra objects or as
+    alternate meshes. Returns the face counts and time of every asset, by object name, and the LOD objects of
+    every object when they are added as objects.
+
+    Objects sharing a mesh share its LOD meshes too, so a mesh is only decimated once.
+    """
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    lods_by_mesh = {}
+    report = {}
+    lod_objects = {}
+    for obj in objects:
+        if obj.type != "MESH" or LOD_LEVEL_KEY in obj:
+            continue
+        mesh = obj.data
+        face_count = len(mesh.polygons)
+        if face_count < min_faces:
+            continue
+
+        start = time.perf_counter()
+        with profiling.stage("lod_generation", obj.name):
+            lod_meshes = lods_by_mesh.get(mesh)
+            if lod_meshes is None:
+                lod_meshes = [decimate(obj, ratio, depsgraph) for ratio in ratios]
+                for level, lod_mesh in enumerate(lod_meshes, 1):
+                    lod_mesh.name = f"{mesh.name}_LOD{level}"
+                lods_by_mesh[mesh] = lod_meshes
+            if as_objects:
+                lod_objects[obj] = add_lod_objects(obj, lod_meshes)
+            else:
+                set_lod_meshes(obj, lod_meshes)
+        report[obj.name] = {
+            "faces": face_count,
+            "lod_faces": [len(lod_mesh.polygons) for lod_mesh in lod_meshes],
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+    return report, lod_objects
+
+
+def generate_imported_lods(objects):
+    """Generate the LODs of the imported objects with the panel settings, returning the report and the LOD objects
+    of every object"""
+    props = bpy.context.scene.batch_import_assets_props
+    if not props.use_lods:
+        return {}, {}
+    ratios = parse_lod_ratios(props.lod_ratios)
+    if not ratios:
+        return {}, {}
+    return generate_lods(objects, ratios, props.lod_min_faces, as_objects=props.asset_type == "COLLECTION")
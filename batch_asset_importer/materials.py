@@ -0,0 +1,53 @@
+import bpy
+
+from .functions import create_material, assign_textures_to_material, is_color_texture_type, get_image_node_name
+
+
+TEMPLATE_NAME_PREFIX = ".BIA Template"
+
+
+class MaterialTemplateCache:
+    """Builds the node tree of a material once for each set of map types, and copies it for the other materials.
+
+    The node tree only depends on which map types are present (the settings are fixed for a run), so every
+    other material with the same maps is a copy of the template with its image references swapped.
+    """
+
+    def __init__(self):
+        self.templates = {}
+        # Remove the templates left over by an interrupted run
+        bpy.data.batch_remove([mat for mat in bpy.data.materials if mat.name.startswith(TEMPLATE_NAME_PREFIX)])
+
+    def get_template(self, textures):
+        signature = frozenset(textures)
+        template = self.templates.get(signature)
+        if template is None:
+            template = create_material(f"{TEMPLATE_NAME_PREFIX} {len(self.templates)}")
+            assign_textures_to_material(template, textures)
+            self.templates[signature] = template
+        return template
+
+    def instantiate(self, material_name, textures):
+        material = self.get_template(textures).copy()
+        material.name = material_name
+
+        nodes = material.node_tree.nodes
+        for texture_type, texture in textures.items():
+            if not is_color_texture_type(texture_type) and texture.colorspace_settings.name != "Non-Color":
+                texture.colorspace_settings.name = "Non-Color"
+            # The image nodes are named after their map type by assign_textures_to_material
+            n_tex = nodes.get(get_image_node_name(texture_type))
+            if n_tex is not None:
+                n_tex.image = texture
+        return material
+
+    def clear(self):
+        bpy.data.batch_remove(list(self.templates.values()))
+        self.templates = {}
+
+
+def create_material_templates():
+    props = bpy.context.scene.batch_import_assets_props
+    if not props.use_material_templates:
+        return None
+    return MaterialTemplateCache()
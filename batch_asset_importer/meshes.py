@@ -0,0 +1,143 @@
+import bpy
+import hashlib
+import numpy as np
+from collections import defaultdict
+
+
+# ID property storing the geometry hash of a mesh
+GEOMETRY_HASH_KEY = "bia_geometry_hash"
+# ID property storing the geometry sample of a mesh when its hash was stored, to tell whether the hash is stale
+GEOMETRY_SAMPLE_KEY = "bia_geometry_sample"
+
+# The number of vertices read for a geometry sample
+SAMPLE_VERTEX_COUNT = 64
+
+
+def get_buffer(collection, attribute, dtype, size=1):
+    buffer = np.empty(len(collection) * size, dtype=dtype)
+    collection.foreach_get(attribute, buffer)
+    return buffer
+
+
+def get_geometry_counts(mesh):
+    """The element counts of a mesh, which are cheap to get and differ for most meshes"""
+    return len(mesh.vertices), len(mesh.edges), len(mesh.polygons), len(mesh.loops), len(mesh.materials)
+
+
+def get_geometry_sample(mesh):
+    """A cheap fingerprint of a mesh: its element counts and the coordinates of a few vertices spread over it"""
+    vertices = mesh.vertices
+    step = max(1, len(vertices) // SAMPLE_VERTEX_COUNT)
+    sample = hashlib.blake2b(digest_size=8)
+    sample.update(np.array(get_geometry_counts(mesh), dtype=np.int64).tobytes())
+    for index in range(0, len(vertices), step)[:SAMPLE_VERTEX_COUNT]:
+        sample.update(np.array(vertices[index].co, dtype=np.float32).tobytes())
+    return sample.hexdigest()
+
+
+def get_geometry_hash(mesh):
+    """A fingerprint of the geometry of a mesh: its element counts and a hash of its coordinates, topology,
+    shading, material indices and UV maps"""
+    geometry_hash = hashlib.blake2b(digest_size=16)
+    geometry_hash.update(np.array(get_geometry_counts(mesh), dtype=np.int64).tobytes())
+    geometry_hash.update(get_buffer(mesh.vertices, "co", np.float32, 3).tobytes())
+    geometry_hash.update(get_buffer(mesh.edges, "vertices", np.int32, 2).tobytes())
+    geometry_hash.update(get_buffer(mesh.loops, "vertex_index", np.int32).tobytes())
+    geometry_hash.update(get_buffer(mesh.polygons, "loop_total", np.int32).tobytes())
+    geometry_hash.update(get_buffer(mesh.polygons, "use_smooth", bool).tobytes())
+    geometry_hash.update(get_buffer(mesh.polygons, "material_index", np.int32).tobytes())
+    for uv_layer in mesh.uv_layers:
+        geometry_hash.update(uv_layer.name.encode())
+        geometry_hash.update(get_buffer(uv_layer.data, "uv", np.float32, 2).tobytes())
+    return geometry_hash.hexdigest()
+
+
+def is_deduplicable(mesh):
+    # The shape keys belong to the mesh, and can't be told apart by the geometry
+    return mesh.shape_keys is None and not mesh.library
+
+
+class MeshDeduplicator:
+    """Remaps the objects whose meshes have identical geometry to a single mesh data-block.
+
+    Meshes are only hashed when another mesh has the same element counts, so most meshes are never read.
+    The hashes are stored on the meshes, so later imports can be matched against them. A stored hash is only
+    trusted while the geometry sample stored with it still matches, so meshes edited since are hashed again.
+    """
+
+    def __init__(self):
+        self.meshes_by_hash = {}
+        # Element counts -> library meshes that weren't compared yet
+        self.library_meshes = defaultdict(list)
+        self.deduplicated_count = 0
+
+    def index_library_meshes(self, excluded):
+        self.library_meshes.clear()
+        for mesh in bpy.data.meshes:
+            if mesh.users == 0 or mesh in excluded or not is_deduplicable(mesh):
+                continue
+            self.library_meshes[get_geometry_counts(mesh)].append(mesh)
+
+    def get_hash(self, mesh):
+        sample = get_geometry_sample(mesh)
+        geometry_hash = mesh.get(GEOMETRY_HASH_KEY)
+        if not geometry_hash or mesh.get(GEOMETRY_SAMPLE_KEY) != sample:
+            geometry_hash = get_geometry_hash(mesh)
+            mesh[GEOMETRY_HASH_KEY] = geometry_hash
+            mesh[GEOMETRY_SAMPLE_KEY] = sample
+        return geometry_hash
+
+    def get_original(self, mesh, counts):
+        """Get the first mesh with the same geometry, which is the mesh itself if it is the first one"""
+        # The library meshes with the same counts come first, so the existing meshes stay the originals
+        for other in self.library_meshes.pop(counts, []):
+            self.meshes_by_hash.setdefault(self.get_hash(other), other)
+        return self.meshes_by_hash.setdefault(self.get_hash(mesh), mesh)
+
+    def deduplicate(self, objects):
+        """Remap the given mesh objects to the original of their mesh, returning the number of remapped objects.
+
+        The objects keep their own materials: when they differ from the ones of the original mesh, they are
+        moved to object-level material slots. The duplicate meshes are left unused, for the orphan purge.
+        """
+        objects_by_mesh = defaultdict(list)
+        for obj in objects:
+            if obj.type == "MESH" and is_deduplicable(obj.data):
+                objects_by_mesh[obj.data].append(obj)
+        self.index_library_meshes(objects_by_mesh)
+
+        meshes_by_counts = defaultdict(list)
+        for mesh in objects_by_mesh:
+            meshes_by_counts[get_geometry_counts(mesh)].append(mesh)
+
+        remapped_count = 0
+        for counts, meshes in meshes_by_counts.items():
+            if len(meshes) == 1 and counts not in self.library_meshes:
+                continue
+            for mesh in meshes:
+                original = self.get_original(mesh, counts)
+                if original == mesh:
+                    continue
+                for obj in objects_by_mesh[mesh]:
+                    materials = [slot.material for slot in obj.material_slots]
+                    obj.data = original
+                    if materials != list(original.materials):
+                        for slot, material in zip(obj.material_slots, materials):
+                            slot.link = "OBJECT"
+                            slot.material = material
+                    remapped_count += 1
+
+        self.deduplicated_count += remapped_count
+        return remapped_count
+
+    def get_summary(self):
+        return {"deduplicated": self.deduplicated_count}
+
+
+def deduplicate_meshes(objects):
+    """Remap the objects with duplicate geometry to shared meshes, if enabled. Returns the number of remapped
+    objects"""
+    props = bpy.context.scene.batch_import_assets_props
+    if not props.use_mesh_deduplication:
+        return 0
+    return MeshDeduplicator().deduplicate(objects)
@@ -1,72 +1,185 @@
 import bpy
-import os
-
-from .functions import (
-    import_fbx_files_and_textures,
-    clear_parents_and_keep_transform,
-    delete_empties,
-    apply_all_transforms,
-    mark_all_objects_as_asset,
-    mark_unused_materials_as_asset,
-    get_catalogs
-)
+
+from .pipeline import ImportPipeline
+from .previews import cancel_previews
+from .images import swap_image_resolution
+
+
+# The keys of undo, redo and the undo history (with Ctrl or Cmd). Undoing restores the file under the running import,
+# which holds references to the data-blocks it created
+UNDO_KEYS = {'Z', 'Y'}
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes}m"
+    if minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
 
 
 class BIA_OT_import_assets(bpy.types.Operator):
     bl_idname = "import_assets.batch_import_assets"
     bl_label = "Batch Import Assets"
-    bl_description = "Batch import all the FBX files and texture sets in a folder"
+    bl_description = "Batch import all the mesh files and texture sets in a folder. Press Esc to stop the import"
     bl_options = {'REGISTER', 'UNDO'}
 
+    _timer = None
+    _pipeline = None
+    _last_checkpoint = 0
+
     def execute(self, context):
+        summary = ImportPipeline(context).run()
+        self.report_summary(context, summary)
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        wm = context.window_manager
+        self._pipeline = ImportPipeline(context)
+        self._pipeline.start()
+        try:
+            self._pipeline.begin_import()
+        except Exception:
+            self._pipeline.cancel()
+            self._pipeline.exit_bulk_mode()
+            raise
+        self._last_checkpoint = 0
+
+        wm.progress_begin(0, max(self._pipeline.total, 1))
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        pipeline = self._pipeline
         props = context.scene.batch_import_assets_props
-        wm_props = context.window_manager.batch_import_assets_wm_props
 
-        folder_name = os.path.basename(props.folder_path)
-        props.main_collection_name = folder_name
+        if event.type == 'ESC':
+            pipeline.cancel()
+            return self.finish(context)
+        if event.type in UNDO_KEYS and (event.ctrl or event.oskey):
+            return {'RUNNING_MODAL'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        try:
+            is_done = pipeline.import_step(props.chunk_size)
+
+            imported_count = len(pipeline.imported_folders)
+            if (
+                not is_done
+                and props.checkpoint_interval > 0
+                and imported_count - self._last_checkpoint >= props.checkpoint_interval
+            ):
+                pipeline.checkpoint()
+                self._last_checkpoint = imported_count
+        except Exception:
+            self.cleanup(context)
+            pipeline.cancel()
+            pipeline.exit_bulk_mode()
+            raise
+
+        if is_done:
+            return self.finish(context)
+
+        self.update_status(context)
+        return {'RUNNING_MODAL'}
+
+    def update_status(self, context):
+        pipeline = self._pipeline
+        rate, eta = pipeline.throughput
+        context.window_manager.progress_update(pipeline.progress)
+        context.workspace.status_text_set(
+            f"Importing assets: {pipeline.progress}/{pipeline.total} "
+            f"({rate:.1f} assets/s, ETA {format_duration(eta)}). Press Esc to stop"
+        )
+
+    def cleanup(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+    def finish(self, context):
+        self.cleanup(context)
+        self._pipeline.finish()
+        self.report_summary(context, self._pipeline.get_summary())
+        return {'FINISHED'}
 
-        # Delete all existing empty collections
-        for collection in bpy.data.collections:
-            if not collection.objects:
-                bpy.data.collections.remove(collection)
+    def report_summary(self, context, summary):
+        wm_props = context.window_manager.batch_import_assets_wm_props
+        counts = summary["counts"]
+
+        if counts["failed"]:
+            self.report({'WARNING'}, f"{counts['failed']} asset folders failed to import, see the console for details.")
+            for failure in summary["failures"]:
+                print(f"Failed to import {failure['folder']}:\n{failure['error']}")
+
+        bytes_saved = summary["images"]["bytes_saved"]
+        if bytes_saved:
+            self.report(
+                {'INFO'},
+                f"{summary['images']['deduplicated']} duplicate textures reused, {bytes_saved / 2 ** 20:.1f} MB saved."
+            )
+
+        wm_props.report_path = summary.get("report_path", "")
+        wm_props.total_seconds = summary["timings"]["total"]
+        wm_props.stage_timings.clear()
+        for name, stats in summary["profile"]["stages"].items():
+            item = wm_props.stage_timings.add()
+            item.name = name
+            item.seconds = stats["seconds"]
+            item.calls = stats["calls"]
+
+        if summary["cancelled"]:
+            self.report({'WARNING'}, f"Batch import stopped. {counts['imported']}/{counts['to_import']} asset folders imported.")
+        else:
+            self.report({'INFO'}, f"Batch import completed. {counts['imported']}/{counts['scanned']} asset folders imported.")
 
-        import_fbx_files_and_textures(context.scene.batch_import_assets_props.folder_path)
-        clear_parents_and_keep_transform()
-        delete_empties()
 
-        if props.is_apply_transforms:
-            apply_all_transforms()
+class BIA_OT_open_save_dialog(bpy.types.Operator):
+    bl_idname = "import_assets.open_save_dialog"
+    bl_label = "Open Save Dialog"
+    bl_description = "Open the save dialog to save the file"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        bpy.ops.wm.save_as_mainfile('INVOKE_DEFAULT')
+        return {'FINISHED'}
 
-        meshes_catalog_uuid, materials_catalog_uuid = get_catalogs(folder_name)
-        
-        mark_all_objects_as_asset(meshes_catalog_uuid)
 
-        bpy.ops.outliner.orphans_purge(do_recursive=True)
+class BIA_OT_swap_texture_resolution(bpy.types.Operator):
+    bl_idname = "import_assets.swap_texture_resolution"
+    bl_label = "Swap Texture Resolution"
+    bl_description = "Point the textures loaded from proxies at their full resolution files, or back at the proxies"
+    bl_options = {'REGISTER', 'UNDO'}
 
-        mark_unused_materials_as_asset(materials_catalog_uuid)
+    is_full_res: bpy.props.BoolProperty(name="Full Resolution", default=True)
 
-        if props.is_save_blend_file:
-            bpy.ops.wm.save_as_mainfile(filepath=bpy.data.filepath)
-        
-        wm_props.show_save_info = True
-        self.report({'INFO'}, "Batch import completed.")
+    def execute(self, context):
+        count = sum(swap_image_resolution(image, self.is_full_res) for image in bpy.data.images)
+        resolution = "full resolution" if self.is_full_res else "proxy"
+        self.report({'INFO'}, f"{count} textures swapped to their {resolution} files.")
         return {'FINISHED'}
 
 
-class BIA_OT_open_save_dialog(bpy.types.Operator):
-    bl_idname = "import_assets.open_save_dialog"
-    bl_label = "Open Save Dialog"
-    bl_description = "Open the save dialog to save the file"
+class BIA_OT_cancel_previews(bpy.types.Operator):
+    bl_idname = "import_assets.cancel_previews"
+    bl_label = "Cancel Previews"
+    bl_description = "Stop generating the asset previews. The previews rendered so far are kept"
     bl_options = {'REGISTER'}
 
     def execute(self, context):
-        bpy.ops.wm.save_as_mainfile('INVOKE_DEFAULT')
+        cancel_previews()
         return {'FINISHED'}
 
 
 classes = (
     BIA_OT_import_assets,
-    BIA_OT_open_save_dialog
+    BIA_OT_open_save_dialog,
+    BIA_OT_swap_texture_resolution,
+    BIA_OT_cancel_previews
 )
 
 
@@ -0,0 +1,112 @@
+import bpy
+import os
+import hashlib
+import numpy as np
+
+from . import scanner, textures
+
+
+PACKED_FOLDER = "packed"
+
+# The value of a channel without a source file: no occlusion, mid roughness, not metallic
+CHANNEL_DEFAULTS = {
+    "ao": 1.0,
+    "roughness": 0.5,
+    "metallic": 0.0,
+}
+
+
+def pack_channels(channel_paths, defaults, output_path):
+    """Pack the first channel of up to three image files into the red, green and blue channels of a PNG file.
+
+    The sources are scaled to the largest of them, and the channels without a file are filled with their default.
+    """
+    sources = [bpy.data.images.load(path) if path else None for path in channel_paths]
+    try:
+        width, height = max(
+            (tuple(image.size) for image in sources if image is not None), key=lambda size: size[0] * size[1]
+        )
+        packed = np.empty((width * height, 4), dtype=np.float32)
+        packed[:, 3] = 1.0
+        for channel, (image, default) in enumerate(zip(sources, defaults)):
+            if image is None:
+                packed[:, channel] = default
+                continue
+            # Read the stored values, without a color space conversion
+            image.colorspace_settings.name = "Non-Color"
+            if tuple(image.size) != (width, height):
+                image.scale(width, height)
+            pixels = np.empty(width * height * image.channels, dtype=np.float32)
+            image.pixels.foreach_get(pixels)
+            packed[:, channel] = pixels[::image.channels]
+            del pixels
+    finally:
+        for image in sources:
+            if image is not None:
+                bpy.data.images.remove(image)
+
+    output = bpy.data.images.new(os.path.basename(output_path), width, height, alpha=False)
+    try:
+        output.colorspace_settings.name = "Non-Color"
+        output.pixels.foreach_set(packed.ravel())
+        output.file_format = "PNG"
+        output.save(filepath=output_path)
+    finally:
+        bpy.data.images.remove(output)
+
+
+def get_packed_path(cache_dir, channel_files):
+    """The cached packed texture of the channel files, named after their paths, sizes and modification times"""
+    key = "\n".join(
+        f"{source_file.path}:{source_file.size}:{source_file.mtime}" if source_file else "" for source_file in channel_files
+    )
+    name = f"{hashlib.sha1(key.encode()).hexdigest()}_{textures.DEFAULT_PACKED_TYPE}.png"
+    return os.path.join(cache_dir, name)
+
+
+def get_packed_texture_files(asset_folder, cache_folder_path, map_names):
+    """Get the texture files of an asset folder, with its separate AO, roughness and metallic files replaced by a
+    packed texture. The packed texture is written to the cache folder, unless it is cached already.
+
+    Folders with a packed map already, or with less than two of the maps to pack, are returned as they are. The
+    packed map type only lists the maps that had a file, see textures.get_packed_type.
+    """
+    texture_files = asset_folder.textures
+    if any(textures.get_packed_layout(texture_type) for texture_type in texture_files):
+        return texture_files
+
+    layout = textures.get_packed_layout(textures.DEFAULT_PACKED_TYPE)
+    map_types = [getattr(map_names, field) for field in layout]
+    sources = [texture_files.get(map_type) for map_type in map_types]
+    if sum(1 for source_file in sources if source_file is not None) < 2:
+        return texture_files
+
+    # Pack the proxies when there are, they are what would be loaded otherwise
+    channel_files = [
+        asset_folder.proxy_files.get(source_file.path, source_file) if source_file is not None else None
+        for source_file in sources
+    ]
+    cache_dir = os.path.join(cache_folder_path, PACKED_FOLDER)
+    packed_path = get_packed_path(cache_dir, channel_files)
+    if not os.path.exists(packed_path):
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written under a temporary name, so an interrupted packing never leaves a truncated texture in the cache
+        temp_path = f"{packed_path}.tmp.png"
+        pack_channels(
+            [source_file.path if source_file is not None else None for source_file in channel_files],
+            [CHANNEL_DEFAULTS[field] for field in layout],
+            temp_path,
+        )
+        os.replace(temp_path, packed_path)
+
+    stat = os.stat(packed_path)
+    texture_files = {texture_type: source_file for texture_type, source_file in texture_files.items()
+                     if texture_type not in map_types}
+    # The channels only filled with a default are left out of the type, so they are never wired as maps
+    packed_type = textures.get_packed_type(
+        [field for field, source_file in zip(layout, sources) if source_file is not None]
+    )
+    texture_files[packed_type] = scanner.SourceFile(
+        os.path.basename(packed_path), packed_path, stat.st_size, stat.st_mtime
+    )
+    return texture_files
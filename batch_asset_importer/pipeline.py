@@ -0,0 +1,480 @@
+import bpy
+import os
+import time
+import traceback
+
+from . import profiling
+from .cache import ImportCache
+from .workers import WorkerPool, get_appended_objects
+from .functions import (
+    scan_source_folder,
+    get_changed_asset_folders,
+    remove_asset_folder_data,
+    get_asset_folder_data,
+    remove_named_data,
+    get_blend_folder_path,
+    get_texture_cache_folder_path,
+    props_to_dict,
+    create_image_cache,
+    import_fbx_files_and_textures,
+    clear_parents_and_keep_transform,
+    delete_empties,
+    apply_all_transforms,
+    mark_all_objects_as_asset,
+    get_unmarked_imported_objects,
+    get_data_snapshot,
+    purge_new_orphans,
+    mark_unused_materials_as_asset,
+    get_catalogs
+)
+from .materials import create_material_templates
+from .proxies import create_proxy_pool
+from .images import free_image_buffers
+from .meshes import deduplicate_meshes
+from .lods import generate_imported_lods
+from .previews import get_pending_assets, queue_previews, render_previews
+
+
+def save_after_previews():
+    props = bpy.context.scene.batch_import_assets_props
+    if not (props.is_save_blend_file and props.is_save_after_previews) or not bpy.data.filepath:
+        return
+    try:
+        bpy.ops.wm.save_mainfile(filepath=bpy.data.filepath)
+    except RuntimeError as e:
+        print(f"Could not save the file after generating the previews: {e}")
+
+
+class ImportPipeline:
+    """The whole batch import, from scanning the source folder to saving the library file.
+
+    Shared by the import operator and the command line entry point, and keeps a summary of the run
+    (counts, stage timings and failures) that can be reported or written out as JSON.
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.props = context.scene.batch_import_assets_props
+        self.folder_name = os.path.basename(self.props.folder_path)
+        self.manifest = None
+        self.asset_folders = []
+        self.imported_folders = []
+        self.removed_folders = []
+        # Folder path -> (ID collection, name) of the data of a changed folder, removed when it is imported again
+        self.replaced_data = {}
+        self.import_cache = None
+        self.meshes_catalog_uuid = ""
+        self.materials_catalog_uuid = ""
+        # Asset folder path -> (models catalog UUID, materials catalog UUID)
+        self.folder_catalogs = {}
+        self.failures = []
+        self.profiler = profiling.Profiler(
+            self.props.profiled_stage if self.props.profiled_stage != "NONE" else ""
+        )
+        self.start_time = time.perf_counter()
+        self.import_start_time = 0.0
+        self.next_index = 0
+        self.cached_count = 0
+        self.worker_pool = None
+        self.proxy_pool = None
+        self.image_cache = None
+        self.material_templates = None
+        self.image_summaries = []
+        self.image_names_before = set()
+        # The objects created by this run, the post-processing stages only work on them. Names are kept instead
+        # of references, which don't survive the removal of objects
+        self.created_object_names = []
+        self.is_cancelled = False
+        self.preview_queue = None
+        # The undo preferences replaced by the bulk mode, restored when the import is done
+        self.saved_undo_preferences = None
+        # The data-blocks that existed before the import, only the unused ones created since are purged
+        self.data_snapshot = {}
+        self.purged_count = 0
+        self.deduplicated_mesh_count = 0
+        # Object name -> face counts and time of its LOD levels
+        self.lod_report = {}
+        # The built-in previews can't be rendered without a window, the preview workers don't need one
+        self.generate_previews = not bpy.app.background or self.props.preview_backend == "WORKERS"
+
+    def stage(self, name):
+        return self.profiler.stage(name)
+
+    def add_failure(self, asset_folder, error):
+        self.failures.append({
+            "folder": asset_folder.path if asset_folder is not None else "",
+            "error": error,
+        })
+
+    def start(self):
+        """Scan the source folder and prepare the list of asset folders that need to be imported"""
+        props = self.props
+        props.main_collection_name = self.folder_name
+        profiling.set_active_profiler(self.profiler)
+        if props.use_bulk_mode:
+            self.enter_bulk_mode()
+
+        try:
+            self.image_names_before = {image.name for image in bpy.data.images}
+
+            # Delete all existing empty collections. The main collection of a previous import only has child
+            # collections, which are kept by incremental imports
+            for collection in list(bpy.data.collections):
+                if not collection.objects and not collection.children:
+                    bpy.data.collections.remove(collection)
+
+            with self.stage("scan"):
+                self.manifest = scan_source_folder(props.folder_path)
+            self.asset_folders = list(self.manifest)
+
+            if props.is_incremental:
+                with self.stage("incremental"):
+                    self.import_cache = ImportCache(get_blend_folder_path(), props.folder_path)
+                    self.asset_folders = get_changed_asset_folders(self.import_cache, self.manifest)
+                    self.removed_folders = self.import_cache.get_removed_folders(self.manifest)
+                    remove_asset_folder_data(self.removed_folders)
+                    # Changed folders keep their data until they are imported again, so the folders that fail or
+                    # are never reached (e.g. when stopped) are still in the saved library
+                    self.replaced_data = get_asset_folder_data(
+                        [asset_folder.path for asset_folder in self.asset_folders]
+                    )
+                    for folder_path in self.removed_folders:
+                        self.import_cache.remove_folder(folder_path)
+
+            self.data_snapshot = get_data_snapshot()
+
+            # Objects imported but never marked by an interrupted run are finished along with the new ones
+            self.created_object_names = [obj.name for obj in get_unmarked_imported_objects()]
+
+            with self.stage("catalogs"):
+                # All the scanned folders, for the objects left unmarked by an interrupted import
+                self.meshes_catalog_uuid, self.materials_catalog_uuid, self.folder_catalogs = get_catalogs(
+                    self.folder_name, self.manifest
+                )
+        except Exception:
+            self.exit_bulk_mode()
+            raise
+
+    def enter_bulk_mode(self):
+        """Disable undo during the import, so the operators it runs don't copy the whole file for their undo steps"""
+        preferences = bpy.context.preferences
+        edit = preferences.edit
+        self.saved_undo_preferences = (edit.use_global_undo, edit.undo_steps, preferences.is_dirty)
+        edit.use_global_undo = False
+        edit.undo_steps = 0
+
+    def exit_bulk_mode(self, deferred=False):
+        """Restore the undo preferences. Deferred, they are restored after the calling operator pushed its undo step"""
+        if self.saved_undo_preferences is None:
+            return
+        saved, self.saved_undo_preferences = self.saved_undo_preferences, None
+
+        def restore():
+            preferences = bpy.context.preferences
+            preferences.edit.use_global_undo, preferences.edit.undo_steps, is_dirty = saved
+            # Don't let the temporary change be saved with the preferences
+            preferences.is_dirty = is_dirty
+
+        if deferred:
+            bpy.app.timers.register(restore, first_interval=0.1)
+        else:
+            restore()
+
+    @property
+    def use_workers(self):
+        return self.props.worker_count > 1 and len(self.asset_folders) > 1
+
+    def remove_replaced_data(self, asset_folders):
+        """Remove the previous import of the given changed asset folders, right before their new data is added"""
+        data_names = []
+        for asset_folder in asset_folders:
+            data_names += self.replaced_data.pop(asset_folder.path, [])
+        remove_named_data(data_names)
+
+    def import_asset_folder(self, asset_folder):
+        self.remove_replaced_data([asset_folder])
+        try:
+            objects = import_fbx_files_and_textures([asset_folder], self.image_cache, self.material_templates)
+        except Exception:
+            self.add_failure(asset_folder, traceback.format_exc())
+            return
+        self.created_object_names += [obj.name for obj in objects]
+        self.imported_folders.append(asset_folder)
+
+    @property
+    def total(self):
+        return len(self.asset_folders)
+
+    @property
+    def progress(self):
+        if self.worker_pool is not None:
+            return self.worker_pool.progress
+        return self.next_index
+
+    @property
+    def throughput(self):
+        """The import speed in asset folders per second, and the estimated remaining time in seconds"""
+        elapsed = time.perf_counter() - self.import_start_time
+        rate = self.progress / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.progress) / rate if rate > 0 else 0.0
+        return rate, eta
+
+    def begin_import(self):
+        self.import_start_time = time.perf_counter()
+        # The missing texture proxies are converted first, polled by import_step
+        with self.stage("texture_proxies"):
+            self.proxy_pool = create_proxy_pool(self.asset_folders)
+        if self.proxy_pool is None:
+            self.begin_asset_import()
+
+    def begin_asset_import(self):
+        props = self.props
+        if self.use_workers:
+            settings = props_to_dict(props)
+            # The workers run from a temporary file, so they get the absolute texture cache folder of this file
+            settings["texture_proxy_folder"] = get_texture_cache_folder_path()
+            self.worker_pool = WorkerPool(
+                self.asset_folders, props.worker_count, settings, props.main_collection_name,
+                self.meshes_catalog_uuid, self.materials_catalog_uuid, self.folder_catalogs
+            )
+            self.worker_pool.start()
+        else:
+            self.image_cache = create_image_cache(self.asset_folders)
+            self.material_templates = create_material_templates()
+
+    def import_step(self, chunk_size):
+        """Import the next chunk of asset folders (or poll the workers), returning whether the import is done"""
+        if self.proxy_pool is not None:
+            if not self.proxy_pool.poll():
+                return False
+            with self.stage("texture_proxies"):
+                self.proxy_pool.finish()
+            self.profiler.add_time("texture_proxies", time.perf_counter() - self.import_start_time)
+            self.proxy_pool = None
+            self.import_start_time = time.perf_counter()
+            self.begin_asset_import()
+            return False
+
+        if self.worker_pool is not None:
+            if not self.worker_pool.poll():
+                return False
+            self.collect_worker_results()
+            return True
+
+        with self.stage("import"):
+            chunk = self.asset_folders[self.next_index:self.next_index + chunk_size]
+            for asset_folder in chunk:
+                self.import_asset_folder(asset_folder)
+            self.next_index += len(chunk)
+        return self.next_index >= len(self.asset_folders)
+
+    def collect_worker_results(self):
+        pool = self.worker_pool
+        try:
+            self.profiler.add_time("import", time.perf_counter() - self.import_start_time)
+            with self.stage("append"):
+                images_before = set(bpy.data.images)
+                self.remove_replaced_data(
+                    [asset_folder for job in pool.jobs for asset_folder in job.imported_folders]
+                )
+                appended = pool.append_results()
+                # Each worker only deduplicated its own shard
+                if self.props.use_image_deduplication:
+                    image_cache = create_image_cache([])
+                    image_cache.deduplicate([image for image in bpy.data.images if image not in images_before])
+                    self.image_summaries.append(image_cache.get_summary())
+            # Each worker only deduplicated the meshes of its own shard too
+            with self.stage("mesh_deduplication"):
+                self.deduplicated_mesh_count += deduplicate_meshes(get_appended_objects(appended))
+
+            for job in pool.jobs:
+                if job.is_successful:
+                    self.imported_folders += job.imported_folders
+                    self.failures += job.failures
+                    self.image_summaries.append(job.result.get("images", {}))
+                    self.deduplicated_mesh_count += job.result.get("deduplicated_meshes", 0)
+                    self.lod_report.update(job.result.get("lods", {}))
+                    self.profiler.merge(job.result.get("profile", {}))
+                    continue
+                for asset_folder in job.asset_folders:
+                    self.add_failure(asset_folder, "\n".join(job.log))
+        finally:
+            pool.cleanup()
+            self.worker_pool = None
+
+    def import_all(self, chunk_size=10, poll_interval=0.2):
+        self.begin_import()
+        while not self.import_step(chunk_size):
+            if self.worker_pool is not None or self.proxy_pool is not None:
+                time.sleep(poll_interval)
+
+    def cancel(self):
+        """Stop importing, the asset folders imported so far are still finished normally"""
+        self.is_cancelled = True
+        if self.proxy_pool is not None:
+            self.proxy_pool.cancel()
+            self.proxy_pool = None
+        if self.worker_pool is not None:
+            self.worker_pool.cancel()
+            self.worker_pool.cleanup()
+            self.worker_pool = None
+
+    def update_import_cache(self):
+        if self.import_cache is None:
+            return
+        with self.stage("incremental"):
+            # Failed folders are left out, so they are retried on the next run
+            for asset_folder in self.imported_folders[self.cached_count:]:
+                self.import_cache.update_folder(asset_folder, self.props.use_content_hash)
+            self.cached_count = len(self.imported_folders)
+            self.import_cache.write()
+
+    def checkpoint(self):
+        """Save the file and the import cache, so an interrupted import can resume from here"""
+        with self.stage("checkpoint"):
+            bpy.ops.wm.save_as_mainfile(filepath=bpy.data.filepath)
+        self.update_import_cache()
+
+    def finish(self):
+        """Post-process the imported objects, mark the assets and save the library file"""
+        props = self.props
+        try:
+            if self.material_templates is not None:
+                self.material_templates.clear()
+
+            with self.stage("cleanup"):
+                objects = self.get_created_objects()
+                clear_parents_and_keep_transform(objects)
+                objects = delete_empties(objects)
+
+            if props.is_apply_transforms:
+                with self.stage("apply_transforms"):
+                    apply_all_transforms(objects)
+
+            with self.stage("mesh_deduplication"):
+                self.deduplicated_mesh_count += deduplicate_meshes(objects)
+
+            lod_report, lod_objects = generate_imported_lods(objects)
+            self.lod_report.update(lod_report)
+
+            with self.stage("mark_assets"):
+                mark_all_objects_as_asset(self.meshes_catalog_uuid, False, self.folder_catalogs, objects, lod_objects)
+
+            with self.stage("orphans_purge"):
+                self.purged_count = purge_new_orphans(self.data_snapshot)
+
+            with self.stage("mark_assets"):
+                mark_unused_materials_as_asset(self.materials_catalog_uuid, False, self.folder_catalogs)
+
+            self.update_import_cache()
+
+            if props.is_save_blend_file:
+                with self.stage("save"):
+                    bpy.ops.wm.save_as_mainfile(filepath=bpy.data.filepath)
+
+            # The previews are rendered after the import, and the file is saved again once they are
+            if self.generate_previews:
+                with self.stage("preview_generation"):
+                    self.queue_previews()
+
+            if props.is_lazy_textures:
+                self.free_new_image_buffers()
+
+            profiling.set_active_profiler(None)
+            if props.is_write_report:
+                self.write_report()
+        finally:
+            # Restored also when post-processing fails. Without a window there are no timers, and no undo steps
+            self.exit_bulk_mode(deferred=not bpy.app.background)
+
+    def get_created_objects(self):
+        objects = []
+        for name in self.created_object_names:
+            obj = bpy.data.objects.get(name)
+            if obj is not None:
+                objects.append(obj)
+        return objects
+
+    def get_report_path(self):
+        blend_name = os.path.splitext(os.path.basename(bpy.data.filepath))[0]
+        return os.path.join(get_blend_folder_path(), f"{blend_name}.import_report.json")
+
+    def write_report(self):
+        summary = self.get_summary()
+        self.profiler.write_report(self.get_report_path(), {
+            "folder_path": summary["folder_path"],
+            "blend_file": summary["blend_file"],
+            "counts": summary["counts"],
+            "images": summary["images"],
+            "lods": summary["lods"],
+        })
+
+    def queue_previews(self):
+        """Queue the previews of the new assets, and of the ones whose previews are missing or out of date"""
+        props = self.props
+        source_signatures = {asset_folder.path: asset_folder.signature for asset_folder in self.manifest}
+        assets = get_pending_assets(source_signatures)
+        if props.preview_backend == "WORKERS":
+            # Without a window there are no timers, so wait for the workers
+            self.preview_queue = render_previews(
+                assets, source_signatures, props.preview_worker_count, props.preview_engine, props.preview_size,
+                on_done=save_after_previews, wait=bpy.app.background
+            )
+        else:
+            self.preview_queue = queue_previews(
+                assets, source_signatures, props.preview_batch_size, on_done=save_after_previews
+            )
+
+    def free_new_image_buffers(self):
+        image_names = [image.name for image in bpy.data.images if image.name not in self.image_names_before]
+        # The preview renders decode the textures again
+        if self.preview_queue is not None and self.preview_queue.is_running:
+            self.preview_queue.add_done_callback(lambda: free_image_buffers(image_names))
+        else:
+            free_image_buffers(image_names)
+
+    def run(self):
+        self.start()
+        try:
+            self.import_all(self.props.chunk_size)
+        except Exception:
+            self.cancel()
+            self.exit_bulk_mode()
+            raise
+        self.finish()
+        return self.get_summary()
+
+    def get_image_summary(self):
+        summaries = list(self.image_summaries)
+        if self.image_cache is not None:
+            summaries.append(self.image_cache.get_summary())
+        return {
+            "deduplicated": sum(summary.get("deduplicated", 0) for summary in summaries),
+            "bytes_saved": sum(summary.get("bytes_saved", 0) for summary in summaries),
+        }
+
+    def get_summary(self):
+        return {
+            "folder_path": self.props.folder_path,
+            "blend_file": bpy.data.filepath,
+            "counts": {
+                "scanned": len(self.manifest) if self.manifest is not None else 0,
+                "to_import": len(self.asset_folders),
+                "imported": len(self.imported_folders),
+                "removed": len(self.removed_folders),
+                "failed": len(self.failures),
+                "purged": self.purged_count,
+                "deduplicated_meshes": self.deduplicated_mesh_count,
+                "lods": sum(len(entry["lod_faces"]) for entry in self.lod_report.values()),
+            },
+            "timings": {
+                **{name: round(seconds, 4) for name, seconds in self.profiler.timings.items()},
+                "total": round(time.perf_counter() - self.start_time, 4),
+            },
+            "profile": self.profiler.get_report(),
+            "images": self.get_image_summary(),
+            "lods": self.lod_report,
+            "failures": self.failures,
+            "cancelled": self.is_cancelled,
+            "report_path": self.get_report_path() if self.props.is_write_report else "",
+        }
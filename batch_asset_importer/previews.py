@@ -0,0 +1,492 @@
+import bpy
+import os
+import json
+import math
+import time
+import shutil
+import tempfile
+import traceback
+from collections import deque
+from mathutils import Vector
+
+from .functions import SOURCE_FOLDER_KEY
+from .workers import WorkerJob, get_worker_command, WORKER_PROGRESS_PREFIX, WORKER_RESULT_PREFIX
+
+
+# ID property storing the signature of the source files an asset preview was generated from
+PREVIEW_SOURCE_KEY = "bia_preview_source"
+
+POLL_INTERVAL = 0.5
+PREVIEW_SAMPLES = 16
+PREVIEW_CAMERA_ANGLE = math.radians(35)
+# The direction from the asset to the camera
+PREVIEW_VIEW_DIRECTION = (1.0, -1.0, 0.7)
+# Name, rotation and strength of the sun lights of the preview scene
+PREVIEW_LIGHT_RIG = (
+    ("BIA Key", (math.radians(50), 0.0, math.radians(30)), 3.0),
+    ("BIA Fill", (math.radians(60), 0.0, math.radians(-70)), 1.0),
+    ("BIA Rim", (math.radians(120), 0.0, math.radians(170)), 2.0),
+)
+
+ID_COLLECTIONS = {
+    "OBJECT": "objects",
+    "COLLECTION": "collections",
+    "MATERIAL": "materials",
+}
+
+
+def has_preview(id_data):
+    preview = id_data.preview
+    return preview is not None and preview.image_size[0] > 0
+
+
+def needs_preview(id_data, source_signatures):
+    """Whether the preview of an asset is missing, or was generated from other versions of its source files"""
+    if not has_preview(id_data):
+        return True
+    signature = source_signatures.get(id_data.get(SOURCE_FOLDER_KEY))
+    return signature is not None and id_data.get(PREVIEW_SOURCE_KEY) != signature
+
+
+def get_pending_assets(source_signatures):
+    """Get the imported assets of the given source folders whose previews are missing or out of date"""
+    assets = []
+    for attr in ID_COLLECTIONS.values():
+        for id_data in getattr(bpy.data, attr):
+            if (
+                id_data.asset_data is not None
+                and id_data.get(SOURCE_FOLDER_KEY) in source_signatures
+                and needs_preview(id_data, source_signatures)
+            ):
+                assets.append(id_data)
+    return assets
+
+
+def get_asset_key(id_data):
+    """Get the (ID collection, name) of an asset, to find it again after an undo or in another process"""
+    return ID_COLLECTIONS.get(id_data.id_type), id_data.name
+
+
+def get_asset(key):
+    attr, name = key
+    return getattr(bpy.data, attr).get(name)
+
+
+def redraw_panels():
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == "VIEW_3D":
+                area.tag_redraw()
+
+
+def update_preview_status(done, total, is_running):
+    wm_props = bpy.context.window_manager.batch_import_assets_wm_props
+    wm_props.preview_done = done
+    wm_props.preview_total = total
+    wm_props.is_generating_previews = is_running
+    redraw_panels()
+
+
+class PreviewQueue:
+    """Generates the previews of the assets a few at a time, instead of queueing thousands of preview jobs at once.
+
+    Each batch is started once the previous one is rendered, which is polled from a timer. When the queue is
+    drained, the done callbacks are called (e.g. to save the file, so the previews are kept).
+    """
+
+    def __init__(self, batch_size=8):
+        self.batch_size = max(1, batch_size)
+        # (ID collection, name) of the assets, the ID pointers don't survive an undo
+        self.queued = deque()
+        self.pending = []
+        self.source_signatures = {}
+        self.done_callbacks = []
+        self.done_count = 0
+        self.failed_count = 0
+        # Timers are matched by identity, and every self.poll access is a new bound method
+        self._timer = self.poll
+
+    @property
+    def total(self):
+        return self.done_count + self.failed_count + len(self.pending) + len(self.queued)
+
+    @property
+    def is_running(self):
+        # The timer is also removed when another file is loaded
+        return bpy.app.timers.is_registered(self._timer)
+
+    @property
+    def is_done(self):
+        return not self.queued and not self.pending
+
+    def add(self, assets, source_signatures=None):
+        """Queue the previews of the given assets, skipping the ones that are up to date"""
+        if source_signatures:
+            self.source_signatures.update(source_signatures)
+        queued = set(self.queued)
+        for id_data in assets:
+            key = get_asset_key(id_data)
+            if key[0] is None or key in queued or not needs_preview(id_data, self.source_signatures):
+                continue
+            self.queued.append(key)
+            queued.add(key)
+
+    def add_done_callback(self, callback):
+        self.done_callbacks.append(callback)
+
+    def start(self):
+        if not self.is_running:
+            bpy.app.timers.register(self._timer, first_interval=POLL_INTERVAL)
+
+    def cancel(self):
+        self.queued.clear()
+        self.pending = []
+        self.done_callbacks = []
+        if self.is_running:
+            bpy.app.timers.unregister(self._timer)
+        self.update_status(is_running=False)
+
+    def poll(self):
+        if bpy.app.is_job_running("RENDER_PREVIEW"):
+            return POLL_INTERVAL
+
+        self.collect_pending()
+        if self.queued:
+            self.start_batch()
+            self.update_status(is_running=True)
+            return POLL_INTERVAL
+
+        self.update_status(is_running=False)
+        callbacks, self.done_callbacks = self.done_callbacks, []
+        for callback in callbacks:
+            callback()
+        return None
+
+    def collect_pending(self):
+        """Check the results of the last batch, once no preview job is running anymore"""
+        for key in self.pending:
+            id_data = get_asset(key)
+            if id_data is None or not has_preview(id_data):
+                self.failed_count += 1
+                continue
+            signature = self.source_signatures.get(id_data.get(SOURCE_FOLDER_KEY))
+            if signature is not None:
+                id_data[PREVIEW_SOURCE_KEY] = signature
+            self.done_count += 1
+        self.pending = []
+
+    def start_batch(self):
+        while self.queued and len(self.pending) < self.batch_size:
+            key = self.queued.popleft()
+            id_data = get_asset(key)
+            if id_data is None:
+                continue
+            id_data.asset_generate_preview()
+            self.pending.append(key)
+
+    def update_status(self, is_running):
+        update_preview_status(self.done_count + self.failed_count, self.total, is_running)
+
+
+#-----Preview Workers-----#
+def set_preview_engine(scene, engine):
+    if engine == "CYCLES":
+        scene.render.engine = "CYCLES"
+        scene.cycles.device = "CPU"
+        scene.cycles.samples = PREVIEW_SAMPLES
+        scene.cycles.use_denoising = False
+    else:
+        scene.render.engine = "BLENDER_WORKBENCH"
+        scene.display.shading.light = "STUDIO"
+        scene.display.shading.color_type = "TEXTURE"
+
+
+def create_preview_scene(engine, size):
+    """Create a scene with a camera and a lighting rig, rendering transparent square thumbnails"""
+    scene = bpy.data.scenes.new("BIA Preview")
+    render = scene.render
+    render.resolution_x = render.resolution_y = size
+    render.resolution_percentage = 100
+    render.film_transparent = True
+    render.image_settings.file_format = "PNG"
+    render.image_settings.color_mode = "RGBA"
+    set_preview_engine(scene, engine)
+
+    scene.world = bpy.data.worlds.new("BIA Preview")
+    scene.world.color = (0.05, 0.05, 0.05)
+
+    camera_data = bpy.data.cameras.new("BIA Preview")
+    camera_data.angle = PREVIEW_CAMERA_ANGLE
+    scene.camera = bpy.data.objects.new("BIA Preview Camera", camera_data)
+    scene.collection.objects.link(scene.camera)
+
+    for name, rotation, strength in PREVIEW_LIGHT_RIG:
+        light = bpy.data.lights.new(name, "SUN")
+        light.energy = strength
+        obj = bpy.data.objects.new(name, light)
+        obj.rotation_euler = rotation
+        scene.collection.objects.link(obj)
+    return scene
+
+
+def create_material_preview_object(scene):
+    """Create the sphere the materials are rendered on"""
+    import bmesh
+
+    mesh = bpy.data.meshes.new("BIA Preview Sphere")
+    bm = bmesh.new()
+    bmesh.ops.create_uvsphere(bm, u_segments=48, v_segments=24, radius=1.0, calc_uvs=True)
+    for face in bm.faces:
+        face.smooth = True
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.materials.append(None)
+
+    obj = bpy.data.objects.new("BIA Preview Sphere", mesh)
+    obj.hide_render = True
+    scene.collection.objects.link(obj)
+    return obj
+
+
+def frame_objects(camera, objects):
+    """Place the camera so that the bounds of the objects fill its view"""
+    corners = [obj.matrix_world @ Vector(corner) for obj in objects if obj.type == "MESH" for corner in obj.bound_box]
+    if corners:
+        low = Vector(map(min, zip(*corners)))
+        high = Vector(map(max, zip(*corners)))
+        center = (low + high) / 2
+        radius = max((high - low).length / 2, 1e-4)
+    else:
+        center = Vector()
+        radius = 1.0
+
+    direction = Vector(PREVIEW_VIEW_DIRECTION).normalized()
+    distance = radius / math.sin(camera.data.angle / 2)
+    camera.location = center + direction * distance
+    camera.rotation_euler = (-direction).to_track_quat("-Z", "Y").to_euler()
+    camera.data.clip_start = distance / 100
+    camera.data.clip_end = distance + radius * 2
+
+
+def render_asset_preview(scene, id_data, sphere, filepath):
+    if id_data.id_type == "MATERIAL":
+        sphere.data.materials[0] = id_data
+        sphere.hide_render = False
+        objects = [sphere]
+    elif id_data.id_type == "COLLECTION":
+        scene.collection.children.link(id_data)
+        objects = list(id_data.all_objects)
+    else:
+        scene.collection.objects.link(id_data)
+        objects = [id_data]
+
+    try:
+        frame_objects(scene.camera, objects)
+        scene.render.filepath = filepath
+        bpy.ops.render.render(write_still=True, scene=scene.name)
+    finally:
+        if id_data.id_type == "MATERIAL":
+            sphere.hide_render = True
+        elif id_data.id_type == "COLLECTION":
+            scene.collection.children.unlink(id_data)
+        else:
+            scene.collection.objects.unlink(id_data)
+
+
+def render_worker_main(job_path):
+    with open(job_path, "r") as f:
+        job = json.load(f)
+
+    scene = create_preview_scene(job["engine"], job["size"])
+    sphere = create_material_preview_object(scene)
+
+    rendered = []
+    for i, key in enumerate(job["assets"]):
+        id_data = get_asset(key)
+        if id_data is not None:
+            filepath = os.path.join(job["output_dir"], f"{job['index']}_{i}.png")
+            try:
+                render_asset_preview(scene, id_data, sphere, filepath)
+                rendered.append({"asset": key, "filepath": filepath})
+            except Exception:
+                traceback.print_exc()
+                if scene.render.engine == "BLENDER_WORKBENCH":
+                    # Workbench needs an OpenGL context, which headless render nodes may not have
+                    print("Workbench failed, rendering the previews with Cycles on the CPU instead", flush=True)
+                    set_preview_engine(scene, "CYCLES")
+                    try:
+                        render_asset_preview(scene, id_data, sphere, filepath)
+                        rendered.append({"asset": key, "filepath": filepath})
+                    except Exception:
+                        traceback.print_exc()
+        print(f"{WORKER_PROGRESS_PREFIX}{i + 1}/{len(job['assets'])}", flush=True)
+
+    print(f"{WORKER_RESULT_PREFIX}{json.dumps({'rendered': rendered})}", flush=True)
+
+
+def load_custom_preview(id_data, filepath):
+    with bpy.context.temp_override(id=id_data):
+        bpy.ops.ed.lib_id_load_custom_preview(filepath=filepath)
+
+
+class PreviewRenderPool:
+    """Renders the asset previews in background Blender processes, and loads them as custom previews.
+
+    The workers open a copy of the library file, so they can render while the file is being edited. Cycles on
+    the CPU doesn't need a GPU context, unlike Workbench and the built-in preview jobs, so it is the default.
+    """
+
+    def __init__(self, assets, source_signatures, worker_count, engine="CYCLES", size=256):
+        self.source_signatures = dict(source_signatures)
+        self.work_dir = tempfile.mkdtemp(prefix="bia_previews_")
+        self.blend_path = os.path.join(self.work_dir, "library.blend")
+        self.done_callbacks = []
+        self.done_count = 0
+        self.jobs = []
+        # Timers are matched by identity, and every self.poll access is a new bound method
+        self._timer = self.poll
+
+        keys = []
+        for id_data in assets:
+            key = get_asset_key(id_data)
+            if key[0] is not None and needs_preview(id_data, self.source_signatures):
+                keys.append(key)
+        self.total = len(keys)
+        if not keys:
+            return
+
+        bpy.ops.wm.save_as_mainfile(filepath=self.blend_path, copy=True)
+        worker_count = max(1, min(worker_count, len(keys)))
+        for i in range(worker_count):
+            job_path = os.path.join(self.work_dir, f"job_{i}.json")
+            shard = keys[i::worker_count]
+            with open(job_path, "w") as f:
+                json.dump({
+                    "index": i,
+                    "engine": engine,
+                    "size": size,
+                    "output_dir": self.work_dir,
+                    "assets": shard,
+                }, f)
+            self.jobs.append(WorkerJob(i, shard, job_path, ""))
+
+    @property
+    def is_running(self):
+        # The timer is removed when another file is loaded, while the processes keep running
+        return bpy.app.timers.is_registered(self._timer) or any(job.is_running for job in self.jobs)
+
+    @property
+    def progress(self):
+        return sum(job.progress for job in self.jobs)
+
+    def add_done_callback(self, callback):
+        self.done_callbacks.append(callback)
+
+    def get_command(self, job):
+        # The workers render from a copy of the library file
+        return get_worker_command("previews.render_worker_main", job.job_path, blend_path=self.blend_path)
+
+    def start(self, wait=False):
+        """Start the workers, and poll them from a timer, or until they are done if wait is set"""
+        for job in self.jobs:
+            job.start(self.get_command(job))
+        if not wait:
+            bpy.app.timers.register(self._timer, first_interval=POLL_INTERVAL)
+            update_preview_status(0, self.total, True)
+            return
+        while self.poll_jobs():
+            time.sleep(POLL_INTERVAL)
+        self.finish()
+
+    def poll_jobs(self):
+        """Update the progress of every worker, returning whether some are still running"""
+        for job in self.jobs:
+            job.poll()
+        return not all(job.is_finished for job in self.jobs)
+
+    def poll(self):
+        if self.poll_jobs():
+            update_preview_status(self.progress, self.total, True)
+            return POLL_INTERVAL
+        self.finish()
+        return None
+
+    def finish(self):
+        for job in self.jobs:
+            if job.result is None:
+                print(f"Preview worker {job.index} failed:\n" + "\n".join(job.log))
+                continue
+            for item in job.result["rendered"]:
+                id_data = get_asset(item["asset"])
+                if id_data is None or not os.path.exists(item["filepath"]):
+                    continue
+                load_custom_preview(id_data, item["filepath"])
+                signature = self.source_signatures.get(id_data.get(SOURCE_FOLDER_KEY))
+                if signature is not None:
+                    id_data[PREVIEW_SOURCE_KEY] = signature
+                self.done_count += 1
+
+        self.cleanup()
+        update_preview_status(self.done_count, self.total, False)
+        callbacks, self.done_callbacks = self.done_callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def cancel(self):
+        for job in self.jobs:
+            job.cancel()
+        if bpy.app.timers.is_registered(self._timer):
+            bpy.app.timers.unregister(self._timer)
+        self.done_callbacks = []
+        self.cleanup()
+        update_preview_status(self.done_count, self.total, False)
+
+    def cleanup(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+# The queue of the running preview generation, shared by the imports made while it runs
+_preview_queue = None
+_render_pool = None
+
+
+def get_preview_queue(batch_size=8):
+    global _preview_queue
+    if _preview_queue is None or not _preview_queue.is_running:
+        _preview_queue = PreviewQueue(batch_size)
+    return _preview_queue
+
+
+def queue_previews(assets, source_signatures=None, batch_size=8, on_done=None):
+    """Generate the previews of the given assets in the background, calling on_done once they are all rendered"""
+    queue = get_preview_queue(batch_size)
+    queue.add(assets, source_signatures)
+    if on_done is not None:
+        queue.add_done_callback(on_done)
+    queue.start()
+    queue.update_status(is_running=True)
+    return queue
+
+
+def render_previews(assets, source_signatures=None, worker_count=4, engine="CYCLES", size=256, on_done=None,
+                    wait=False):
+    """Render the previews of the given assets in background processes, calling on_done once they are loaded"""
+    global _render_pool
+    if _render_pool is not None and _render_pool.is_running:
+        _render_pool.cancel()
+    _render_pool = PreviewRenderPool(assets, source_signatures or {}, worker_count, engine, size)
+    if on_done is not None:
+        _render_pool.add_done_callback(on_done)
+    _render_pool.start(wait)
+    return _render_pool
+
+
+def cancel_previews():
+    global _preview_queue, _render_pool
+    if _preview_queue is not None:
+        _preview_queue.cancel()
+        _preview_queue = None
+    if _render_pool is not None:
+        if _render_pool.is_running:
+            _render_pool.cancel()
+        _render_pool = None
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import io
+import json
+import time
+import pstats
+import cProfile
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+"""A module for timing the stages of the import pipeline, with optional cProfile profiling of a single stage"""
+
+
+# The stages of the pipeline, in order. Also used as the items of the profiled stage setting
+STAGES = (
+    ("scan", "Scan", "Scan the source folder"),
+    ("incremental", "Incremental", "Compare the source folders with the import cache"),
+    ("texture_proxies", "Texture Proxies", "Convert the missing reduced resolution texture proxies"),
+    ("import", "Import", "Import the asset folders, including the stages below"),
+    ("texture_packing", "Texture Packing", "Pack the AO, roughness and metallic maps into single textures"),
+    ("texture_load", "Texture Load", "Load the texture images"),
+    ("material_build", "Material Build", "Build the materials"),
+    ("mesh_import", "Mesh Import", "Import the mesh files, in any format"),
+    ("fbx_import", "FBX Import", "Import the FBX files"),
+    ("gltf_import", "glTF Import", "Import the glTF and GLB files"),
+    ("obj_import", "OBJ Import", "Import the OBJ files"),
+    ("usd_import", "USD Import", "Import the USD files"),
+    ("append", "Append", "Append the assets imported by the workers"),
+    ("cleanup", "Cleanup", "Clear the parents and delete the empties"),
+    ("apply_transforms", "Apply Transforms", "Apply the transforms of the imported objects"),
+    ("mesh_deduplication", "Mesh Deduplication", "Share the meshes with identical geometry"),
+    ("lod_generation", "LOD Generation", "Decimate the LOD levels of the imported meshes"),
+    ("catalogs", "Cataloging", "Update the asset catalogs"),
+    ("mark_assets", "Mark Assets", "Mark the objects and materials as assets"),
+    ("preview_generation", "Preview Generation", "Queue the asset previews"),
+    ("orphans_purge", "Orphan Purge", "Remove the unused data-blocks created by the import"),
+    ("checkpoint", "Checkpoint", "Save the file in the middle of the import"),
+    ("save", "Save", "Save the library file"),
+)
+
+OUTLIER_COUNT = 10
+PROFILE_STATS_LINES = 30
+
+
+class StageStats:
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        # Asset -> seconds, for the calls made for a single asset
+        self.asset_seconds: Dict[str, float] = {}
+
+    def add(self, seconds, asset=None):
+        self.seconds += seconds
+        self.calls += 1
+        if asset is not None:
+            self.asset_seconds[asset] = self.asset_seconds.get(asset, 0.0) + seconds
+
+    def merge(self, data):
+        """Add the stats of a serialized StageStats, e.g. reported by a worker process"""
+        self.seconds += data["seconds"]
+        self.calls += data["calls"]
+        for outlier in data.get("outliers", []):
+            self.asset_seconds[outlier["asset"]] = outlier["seconds"]
+
+    def to_dict(self) -> dict:
+        outliers = sorted(self.asset_seconds.items(), key=lambda item: item[1], reverse=True)[:OUTLIER_COUNT]
+        data = {
+            "seconds": round(self.seconds, 4),
+            "calls": self.calls,
+            "mean": round(self.seconds / self.calls, 6) if self.calls else 0.0,
+        }
+        if outliers:
+            data["outliers"] = [{"asset": asset, "seconds": round(seconds, 4)} for asset, seconds in outliers]
+        return data
+
+
+class Profiler:
+    """Records the wall time and call count of every stage, and the slowest assets of the per-asset stages."""
+
+    def __init__(self, profiled_stage=""):
+        self.stages: Dict[str, StageStats] = {}
+        self.profiled_stage = profiled_stage
+        self.profile: Optional[cProfile.Profile] = cProfile.Profile() if profiled_stage else None
+        self.start_time = time.perf_counter()
+        self._depth = 0
+
+    @contextmanager
+    def stage(self, name, asset=None):
+        is_profiled = self.profile is not None and name == self.profiled_stage and self._depth == 0
+        if is_profiled:
+            self.profile.enable()
+            self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if is_profiled:
+                self._depth -= 1
+                self.profile.disable()
+            self.stages.setdefault(name, StageStats(name)).add(seconds, asset)
+
+    def add_time(self, name, seconds, asset=None):
+        self.stages.setdefault(name, StageStats(name)).add(seconds, asset)
+
+    def merge(self, report):
+        """Merge the stages of another profiler's report into this one"""
+        for name, data in report.get("stages", {}).items():
+            self.stages.setdefault(name, StageStats(name)).merge(data)
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        return {name: stats.seconds for name, stats in self.stages.items()}
+
+    def get_profile_stats(self, lines=PROFILE_STATS_LINES) -> List[str]:
+        if self.profile is None:
+            return []
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats("cumulative").print_stats(lines)
+        return stream.getvalue().splitlines()
+
+    def get_report(self) -> dict:
+        order = {name: i for i, (name, _, _) in enumerate(STAGES)}
+        stages = sorted(self.stages.values(), key=lambda stats: order.get(stats.name, len(order)))
+        report = {
+            "total_seconds": round(time.perf_counter() - self.start_time, 4),
+            "stages": {stats.name: stats.to_dict() for stats in stages},
+        }
+        if self.profile is not None:
+            report["profile"] = {"stage": self.profiled_stage, "stats": self.get_profile_stats()}
+        return report
+
+    def write_report(self, path, extra=None) -> dict:
+        report = self.get_report()
+        if extra:
+            report.update(extra)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        if self.profile is not None:
+            self.profile.dump_stats(f"{path}.{self.profiled_stage}.prof")
+        return report
+
+
+# The profiler of the running import, so the pipeline functions can be timed without passing it around
+_active_profiler: Optional[Profiler] = None
+
+
+def set_active_profiler(profiler: Optional[Profiler]):
+    global _active_profiler
+    _active_profiler = profiler
+
+
+def get_active_profiler() -> Optional[Profiler]:
+    return _active_profiler
+
+
+@contextmanager
+def stage(name, asset=None):
+    """Time a stage with the active profiler, if any"""
+    if _active_profiler is None:
+        yield
+        return
+    with _active_profiler.stage(name, asset):
+        yield
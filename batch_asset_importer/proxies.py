@@ -0,0 +1,263 @@
+import bpy
+import os
+import json
+import shutil
+import tempfile
+import traceback
+
+from . import scanner
+from .cache import hash_file
+from .functions import get_texture_cache_folder_path
+from .workers import WorkerJob, get_worker_command, WORKER_PROGRESS_PREFIX, WORKER_RESULT_PREFIX
+
+
+# Proxy tier -> maximum resolution
+PROXY_TIERS = {
+    "4K": 4096,
+    "2K": 2048,
+    "1K": 1024,
+}
+
+# Proxy format -> (Blender file format, file extension)
+PROXY_FORMATS = {
+    "JPEG": ("JPEG", ".jpg"),
+    "WEBP": ("WEBP", ".webp"),
+    "PNG": ("PNG", ".png"),
+}
+
+# Sources already in a compact format, which are only converted when they need to be scaled down
+LOSSY_EXTENSIONS = (".jpg", ".jpeg", ".webp")
+
+INDEX_FILE_NAME = "proxies.json"
+
+
+def get_proxy_name(source_hash, tier, quality, extension):
+    return f"{source_hash}_{tier}_{quality}{extension}"
+
+
+#-----Worker Side-----#
+def convert_texture(source_path, output_path, max_size, file_format, quality):
+    image = bpy.data.images.load(source_path)
+    try:
+        width, height = image.size
+        scale = max_size / max(width, height, 1)
+        if scale < 1:
+            image.scale(max(1, round(width * scale)), max(1, round(height * scale)))
+        image.file_format = file_format
+        image.save(filepath=output_path, quality=quality)
+    finally:
+        bpy.data.images.remove(image)
+
+
+def convert_worker_main(job_path):
+    """Convert the proxies of the job. The sources without a known hash are hashed first, as their proxies are
+    named after it, and their proxy may turn out to be cached already."""
+    with open(job_path, "r") as f:
+        job = json.load(f)
+
+    converted = {}
+    hashes = {}
+    for i, item in enumerate(job["items"]):
+        try:
+            output = item["output"]
+            if not output:
+                source_hash = hash_file(item["source"])
+                hashes[item["source"]] = [item["size"], item["mtime"], source_hash]
+                output = os.path.join(
+                    job["cache_dir"], get_proxy_name(source_hash, job["tier"], item["quality"], item["extension"])
+                )
+            if not os.path.exists(output):
+                # Written under a temporary name, so an interrupted conversion never leaves a truncated proxy in the
+                # cache. The name is unique to the process, as identical sources may be converted by two workers
+                temp_path = f"{output}.{os.getpid()}.tmp{item['extension']}"
+                convert_texture(item["source"], temp_path, item["max_size"], item["file_format"], item["quality"])
+                os.replace(temp_path, output)
+            converted[item["key"]] = output
+        except Exception:
+            traceback.print_exc()
+        print(f"{WORKER_PROGRESS_PREFIX}{i + 1}/{len(job['items'])}", flush=True)
+
+    print(f"{WORKER_RESULT_PREFIX}{json.dumps({'converted': converted, 'hashes': hashes})}", flush=True)
+
+
+#-----Main Process Side-----#
+class TextureProxyCache:
+    """The folder of the reduced resolution proxies of the source textures, named after the hash of their source.
+
+    The hashes are stored in an index with the size and modification time of the sources, so a source is only
+    hashed again when it changes. Hashing is left to the conversion workers, as the sources can be large files on
+    a slow drive. Identical sources in several asset folders share a single proxy.
+    """
+
+    def __init__(self, cache_dir, tier, proxy_format="JPEG", quality=90):
+        self.cache_dir = cache_dir
+        self.tier = tier
+        self.max_size = PROXY_TIERS[tier]
+        self.proxy_format = proxy_format
+        self.quality = quality
+        self.index_path = os.path.join(cache_dir, INDEX_FILE_NAME)
+        # Source path -> [size, mtime, hash]
+        self.index = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def write(self):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(temp_path, self.index_path)
+
+    def get_source_hash(self, source_file):
+        """The indexed hash of a source, or an empty string if it is new or changed since it was hashed"""
+        entry = self.index.get(source_file.path)
+        if entry is not None and entry[0] == source_file.size and entry[1] == source_file.mtime:
+            return entry[2]
+        return ""
+
+    def get_proxy_format(self, source_file, texture_type, map_names):
+        """Height maps lose too much precision in a lossy format, so they stay lossless"""
+        if texture_type in (map_names.displacement, map_names.bump):
+            return PROXY_FORMATS["PNG"]
+        if source_file.path.lower().endswith(LOSSY_EXTENSIONS) and self.proxy_format != "PNG":
+            return PROXY_FORMATS["JPEG"]
+        return PROXY_FORMATS[self.proxy_format]
+
+    def prepare(self, asset_folders, map_names):
+        """Point the asset folders at the cached proxies, returning the conversions of the missing ones and of the
+        sources that still need to be hashed. Only the index is read, so no source is opened."""
+        conversions = {}
+        for asset_folder in asset_folders:
+            for texture_type, source_file in asset_folder.textures.items():
+                file_format, extension = self.get_proxy_format(source_file, texture_type, map_names)
+                source_hash = self.get_source_hash(source_file)
+                proxy_path = ""
+                if source_hash:
+                    proxy_path = os.path.join(
+                        self.cache_dir, get_proxy_name(source_hash, self.tier, self.quality, extension)
+                    )
+                    if os.path.exists(proxy_path):
+                        set_proxy_file(asset_folder, source_file, proxy_path)
+                        continue
+                key = proxy_path or f"{source_file.path}:{extension}"
+                conversion = conversions.setdefault(key, {
+                    "key": key,
+                    "source": source_file.path,
+                    "size": source_file.size,
+                    "mtime": source_file.mtime,
+                    "output": proxy_path,
+                    "extension": extension,
+                    "max_size": self.max_size,
+                    "file_format": file_format,
+                    "quality": self.quality,
+                    "users": [],
+                })
+                conversion["users"].append((asset_folder, source_file))
+        return list(conversions.values())
+
+
+def set_proxy_file(asset_folder, source_file, proxy_path):
+    stat = os.stat(proxy_path)
+    asset_folder.proxy_files[source_file.path] = scanner.SourceFile(
+        os.path.basename(proxy_path), proxy_path, stat.st_size, stat.st_mtime
+    )
+
+
+class ProxyPool:
+    """Converts the missing proxies in background Blender processes, then points their asset folders at them."""
+
+    def __init__(self, proxy_cache, conversions, worker_count):
+        self.proxy_cache = proxy_cache
+        self.conversions = conversions
+        self.work_dir = tempfile.mkdtemp(prefix="bia_proxies_")
+        self.jobs = []
+
+        worker_count = max(1, min(worker_count, len(conversions)))
+        for i in range(worker_count):
+            shard = conversions[i::worker_count]
+            job_path = os.path.join(self.work_dir, f"job_{i}.json")
+            with open(job_path, "w") as f:
+                json.dump({
+                    "cache_dir": proxy_cache.cache_dir,
+                    "tier": proxy_cache.tier,
+                    "items": [
+                        {key: value for key, value in conversion.items() if key != "users"} for conversion in shard
+                    ],
+                }, f)
+            self.jobs.append(WorkerJob(i, shard, job_path, ""))
+
+    @property
+    def total(self):
+        return len(self.conversions)
+
+    @property
+    def progress(self):
+        return sum(job.progress for job in self.jobs)
+
+    def get_command(self, job):
+        return get_worker_command("proxies.convert_worker_main", job.job_path)
+
+    def start(self):
+        for job in self.jobs:
+            job.start(self.get_command(job))
+
+    def poll(self):
+        """Update the progress of every worker, returning whether they have all finished"""
+        for job in self.jobs:
+            job.poll()
+        return all(job.is_finished for job in self.jobs)
+
+    def finish(self):
+        """Point the asset folders at the converted proxies, and index the hashes of the sources hashed by the
+        workers. The ones that failed keep their full resolution source."""
+        converted = {}
+        for job in self.jobs:
+            if job.result is None:
+                print(f"Texture proxy worker {job.index} failed:\n" + "\n".join(job.log))
+                continue
+            converted.update(job.result["converted"])
+            self.proxy_cache.index.update(job.result["hashes"])
+        self.proxy_cache.write()
+
+        for conversion in self.conversions:
+            proxy_path = converted.get(conversion["key"])
+            if proxy_path is None:
+                continue
+            for asset_folder, source_file in conversion["users"]:
+                set_proxy_file(asset_folder, source_file, proxy_path)
+        self.cleanup()
+        return len(converted)
+
+    def cancel(self):
+        for job in self.jobs:
+            job.cancel()
+        self.cleanup()
+
+    def cleanup(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def create_proxy_pool(asset_folders):
+    """Use the cached proxies of the asset folders' textures, and start converting the missing ones.
+    Returns None if proxies are off, or if they are all cached already."""
+    props = bpy.context.scene.batch_import_assets_props
+    if props.texture_proxy_tier == "FULL" or not props.is_import_textures:
+        return None
+
+    proxy_cache = TextureProxyCache(
+        get_texture_cache_folder_path(), props.texture_proxy_tier, props.texture_proxy_format,
+        props.texture_proxy_quality,
+    )
+    conversions = proxy_cache.prepare(asset_folders, props.map_names)
+    if not conversions:
+        return None
+    # Converting is mostly decoding and encoding, which doesn't need a process per core
+    pool = ProxyPool(proxy_cache, conversions, max(props.worker_count, (os.cpu_count() or 2) // 2))
+    pool.start()
+    return pool
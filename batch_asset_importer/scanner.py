@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import os
+import hashlib
+from typing import Dict, List, Optional
+
+"""A module for scanning a source folder into an asset manifest, before any bpy work is done"""
+
+
+TEXTURE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tga", ".bmp", ".tif", ".tiff")
+
+# Mesh file extension -> format
+MESH_FORMATS = {
+    ".fbx": "FBX",
+    ".glb": "GLTF",
+    ".gltf": "GLTF",
+    ".obj": "OBJ",
+    ".usd": "USD",
+    ".usda": "USD",
+    ".usdc": "USD",
+    ".usdz": "USD",
+}
+
+# The static mesh importers of glTF and OBJ are much faster than the FBX one
+DEFAULT_FORMAT_ORDER = "GLTF, OBJ, FBX, USD"
+
+
+def parse_format_order(format_order) -> List[str]:
+    """Parse a comma separated preference order of mesh formats, appending the formats it leaves out"""
+    # Extensions are accepted too, e.g. "glb" for GLTF
+    names = [name.strip() for name in format_order.split(",") if name.strip()]
+    order = [MESH_FORMATS.get(f".{name.lower()}", name.upper()) for name in names]
+    return list(dict.fromkeys(order + list(MESH_FORMATS.values())))
+
+
+def get_mesh_format(filename) -> Optional[str]:
+    return MESH_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+class SourceFile:
+
+    def __init__(self, name, path, size, mtime):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+
+    def __repr__(self):
+        return f"SourceFile({self.path!r}, size={self.size}, mtime={self.mtime})"
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "path": self.path, "size": self.size, "mtime": self.mtime}
+
+    @classmethod
+    def from_dict(cls, data) -> SourceFile:
+        return cls(data["name"], data["path"], data["size"], data["mtime"])
+
+
+class AssetFolder:
+    """A single asset folder in the source tree, with the files found in it."""
+
+    def __init__(self, name, path, relative_path):
+        self.name = name
+        self.path = path
+        self.relative_path = relative_path
+        # The mesh files to import, a single one per file name (without extension) in the preferred format
+        self.mesh_files: List[SourceFile] = []
+        self.texture_files: List[SourceFile] = []
+        # Map type -> texture file, for the textures that could be classified
+        self.textures: Dict[str, SourceFile] = {}
+        # Source texture path -> reduced resolution proxy file, loaded instead of the source
+        self.proxy_files: Dict[str, SourceFile] = {}
+
+    def __repr__(self):
+        return f"AssetFolder({self.relative_path!r})"
+
+    @property
+    def files(self) -> List[SourceFile]:
+        """All the files of this folder that take part in the import"""
+        return self.texture_files + self.mesh_files
+
+    @property
+    def size(self) -> int:
+        return sum(source_file.size for source_file in self.files)
+
+    @property
+    def signature(self) -> str:
+        """A hash of the names, sizes and modification times of the files, which changes with any of them"""
+        data = "|".join(f"{f.name}:{f.size}:{f.mtime}" for f in self.files)
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    def to_dict(self) -> dict:
+        """Serialize the folder, so it can be handed over to another process"""
+        texture_indices = {id(source_file): i for i, source_file in enumerate(self.texture_files)}
+        return {
+            "name": self.name,
+            "path": self.path,
+            "relative_path": self.relative_path,
+            "mesh_files": [source_file.to_dict() for source_file in self.mesh_files],
+            "texture_files": [source_file.to_dict() for source_file in self.texture_files],
+            "textures": {
+                texture_type: texture_indices[id(source_file)] for texture_type, source_file in self.textures.items()
+            },
+            "proxy_files": {path: source_file.to_dict() for path, source_file in self.proxy_files.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data) -> AssetFolder:
+        asset_folder = cls(data["name"], data["path"], data["relative_path"])
+        asset_folder.mesh_files = [SourceFile.from_dict(d) for d in data["mesh_files"]]
+        asset_folder.texture_files = [SourceFile.from_dict(d) for d in data["texture_files"]]
+        asset_folder.textures = {
+            texture_type: asset_folder.texture_files[i] for texture_type, i in data["textures"].items()
+        }
+        asset_folder.proxy_files = {
+            path: SourceFile.from_dict(d) for path, d in data.get("proxy_files", {}).items()
+        }
+        return asset_folder
+
+
+class AssetManifest:
+    """The result of scanning a source folder: every asset folder in the tree, in walk order."""
+
+    def __init__(self, root_path):
+        self.root_path = root_path
+        self.folders: List[AssetFolder] = []
+
+    def __iter__(self):
+        return iter(self.folders)
+
+    def __len__(self):
+        return len(self.folders)
+
+    def __getitem__(self, index) -> AssetFolder:
+        return self.folders[index]
+
+
+def _scan_directory(path):
+    """List a directory with a single scandir call, returning (subdirectories, files) sorted by name."""
+    dirs = []
+    files = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        dirs.append(entry)
+                    else:
+                        files.append(entry)
+                except OSError:
+                    continue
+    except OSError:
+        return [], []
+    dirs.sort(key=lambda e: e.name)
+    files.sort(key=lambda e: e.name)
+    return dirs, files
+
+
+def _source_file(entry) -> Optional[SourceFile]:
+    try:
+        stat = entry.stat()
+    except OSError:
+        return None
+    return SourceFile(entry.name, entry.path, stat.st_size, stat.st_mtime)
+
+
+def _fill_asset_folder(asset_folder: AssetFolder, files, classifier, format_ranks):
+    # File name without extension -> (rank of its format, mesh file)
+    mesh_files = {}
+    for entry in files:
+        name = entry.name
+        mesh_format = get_mesh_format(name)
+        if mesh_format is not None:
+            stem = os.path.splitext(name)[0]
+            rank = format_ranks[mesh_format]
+            if stem in mesh_files and mesh_files[stem][0] <= rank:
+                continue
+            source_file = _source_file(entry)
+            if source_file is not None:
+                mesh_files[stem] = (rank, source_file)
+        elif name.endswith(TEXTURE_EXTENSIONS):
+            source_file = _source_file(entry)
+            if source_file is not None:
+                asset_folder.texture_files.append(source_file)
+    asset_folder.mesh_files = [source_file for _, source_file in mesh_files.values()]
+
+    if classifier is None:
+        return
+    texture_types = classifier.classify_many(source_file.name for source_file in asset_folder.texture_files)
+    for source_file in asset_folder.texture_files:
+        texture_type = texture_types[source_file.name]
+        if texture_type:
+            asset_folder.textures[texture_type] = source_file
+
+
+def scan_folder(folder_path, classifier=None, format_order=DEFAULT_FORMAT_ORDER) -> AssetManifest:
+    """Scan every subfolder of folder_path (at any depth) as an asset folder.
+
+    The texture files are classified with the given TextureClassifier, one folder listing at a time. Every mesh
+    file is imported, but when the same file name exists in several formats, only the first one in format_order
+    is kept.
+
+    Each directory is listed exactly once. The folders are returned in the same order as os.walk would
+    visit them, and symlinked directories are listed but not descended into.
+    """
+    manifest = AssetManifest(folder_path)
+    format_ranks = {name: rank for rank, name in enumerate(parse_format_order(format_order))}
+    root_dirs, _ = _scan_directory(folder_path)
+    stack = [root_dirs]
+
+    while stack:
+        dirs = stack.pop()
+        children = []
+        for entry in dirs:
+            sub_dirs, files = _scan_directory(entry.path)
+            asset_folder = AssetFolder(entry.name, entry.path, os.path.relpath(entry.path, folder_path))
+            _fill_asset_folder(asset_folder, files, classifier, format_ranks)
+            manifest.folders.append(asset_folder)
+            try:
+                is_symlink = entry.is_symlink()
+            except OSError:
+                is_symlink = True
+            if sub_dirs and not is_symlink:
+                children.append(sub_dirs)
+        # os.walk descends into the children in order, so push them reversed
+        stack.extend(reversed(children))
+
+    return manifest
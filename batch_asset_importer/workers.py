@@ -0,0 +1,332 @@
+import bpy
+import os
+import json
+import queue
+import shutil
+import tempfile
+import threading
+import traceback
+import subprocess
+
+from . import profiling, scanner
+from .materials import create_material_templates
+from .meshes import deduplicate_meshes
+from .lods import generate_imported_lods
+from .functions import (
+    props_from_dict,
+    create_image_cache,
+    import_fbx_files_and_textures,
+    clear_parents_and_keep_transform,
+    delete_empties,
+    apply_all_transforms,
+    mark_all_objects_as_asset,
+    mark_unused_materials_as_asset,
+    get_main_collection,
+    get_data_snapshot,
+    purge_new_orphans,
+    remove_asset_folder_data,
+)
+
+
+WORKER_PROGRESS_PREFIX = "BIA_PROGRESS "
+WORKER_RESULT_PREFIX = "BIA_RESULT "
+WORKER_LOG_LINES = 50
+
+# Run in each background Blender process: import this add-on and call an entry point with the job file
+WORKER_EXPR = """\
+import bpy, sys, importlib
+if {empty_file!r}:
+    bpy.ops.wm.read_homefile(use_empty=True, use_factory_startup=True)
+sys.path.insert(0, {addon_parent!r})
+module = importlib.import_module({package!r})
+if {register!r}:
+    module.register()
+module.{entry_point}(sys.argv[sys.argv.index("--") + 1])
+"""
+
+
+def get_worker_command(entry_point, job_path, blend_path="", register=False):
+    """The command running an entry point of this add-on (e.g. "workers.worker_main") in a background Blender
+    process. The process opens the blend file if given, and starts from an empty file otherwise."""
+    addon_dir = os.path.dirname(os.path.abspath(__file__))
+    expr = WORKER_EXPR.format(
+        empty_file=not blend_path, addon_parent=os.path.dirname(addon_dir), package=os.path.basename(addon_dir),
+        register=register, entry_point=entry_point,
+    )
+    command = [bpy.app.binary_path, "-b", "--factory-startup"]
+    if blend_path:
+        command.append(blend_path)
+    return command + ["--python-expr", expr, "--", job_path]
+
+
+#-----Worker Side-----#
+def worker_main(job_path):
+    with open(job_path, "r") as f:
+        job = json.load(f)
+
+    props = bpy.context.scene.batch_import_assets_props
+    props_from_dict(props, job["settings"])
+    props.main_collection_name = job["main_collection_name"]
+
+    profiler = profiling.Profiler(props.profiled_stage if props.profiled_stage != "NONE" else "")
+    profiling.set_active_profiler(profiler)
+
+    asset_folders = [scanner.AssetFolder.from_dict(data) for data in job["asset_folders"]]
+    snapshot = get_data_snapshot()
+    image_cache = create_image_cache(asset_folders)
+    material_templates = create_material_templates()
+    objects = []
+    failures = []
+    for i, asset_folder in enumerate(asset_folders):
+        objects_before = set(bpy.data.objects)
+        try:
+            objects += import_fbx_files_and_textures([asset_folder], image_cache, material_templates)
+        except Exception:
+            # A broken folder only fails itself: its partial import is removed, so it is never appended
+            failures.append({"folder": asset_folder.path, "error": traceback.format_exc()})
+            bpy.data.batch_remove([obj for obj in bpy.data.objects if obj not in objects_before])
+            remove_asset_folder_data([asset_folder.path])
+        print(f"{WORKER_PROGRESS_PREFIX}{i + 1}/{len(asset_folders)}", flush=True)
+    if material_templates is not None:
+        material_templates.clear()
+
+    with profiling.stage("cleanup"):
+        clear_parents_and_keep_transform(objects)
+        objects = delete_empties(objects)
+    if props.is_apply_transforms:
+        with profiling.stage("apply_transforms"):
+            apply_all_transforms(objects)
+    with profiling.stage("mesh_deduplication"):
+        deduplicated_mesh_count = deduplicate_meshes(objects)
+    # Large batches are split across the workers, so the decimation runs in parallel
+    lod_report, lod_objects = generate_imported_lods(objects)
+
+    # Previews are generated by the main process once the results are appended
+    with profiling.stage("mark_assets"):
+        mark_all_objects_as_asset(
+            job["meshes_catalog_uuid"], generate_previews=False, folder_catalogs=job["folder_catalogs"],
+            objects=objects, lod_objects=lod_objects
+        )
+    with profiling.stage("orphans_purge"):
+        purge_new_orphans(snapshot)
+    with profiling.stage("mark_assets"):
+        mark_unused_materials_as_asset(
+            job["materials_catalog_uuid"], generate_previews=False, folder_catalogs=job["folder_catalogs"]
+        )
+
+    # Keep the texture paths absolute, they are made relative when the main file is saved
+    with profiling.stage("save"):
+        bpy.ops.wm.save_as_mainfile(filepath=job["output_path"], relative_remap=False)
+    profiling.set_active_profiler(None)
+
+    result = {
+        "output_path": job["output_path"],
+        "failures": failures,
+        "images": image_cache.get_summary() if image_cache is not None else {},
+        "deduplicated_meshes": deduplicated_mesh_count,
+        "lods": lod_report,
+        "profile": profiler.get_report(),
+    }
+    print(f"{WORKER_RESULT_PREFIX}{json.dumps(result)}", flush=True)
+
+
+#-----Main Process Side-----#
+def shard_asset_folders(asset_folders, worker_count):
+    """Split the asset folders into balanced shards, using the size of their files as the cost"""
+    worker_count = max(1, min(worker_count, len(asset_folders)))
+    shards = [[] for _ in range(worker_count)]
+    loads = [0] * worker_count
+
+    order = {id(asset_folder): i for i, asset_folder in enumerate(asset_folders)}
+    for asset_folder in sorted(asset_folders, key=lambda f: f.size, reverse=True):
+        i = loads.index(min(loads))
+        shards[i].append(asset_folder)
+        # Every folder has a fixed cost on top of its size, so empty folders are spread too
+        loads[i] += asset_folder.size + 1
+
+    for shard in shards:
+        shard.sort(key=lambda f: order[id(f)])
+    return [shard for shard in shards if shard]
+
+
+class WorkerJob:
+    """A single background Blender process, importing one shard of the asset folders."""
+
+    def __init__(self, index, asset_folders, job_path, output_path):
+        self.index = index
+        self.asset_folders = asset_folders
+        self.job_path = job_path
+        self.output_path = output_path
+        self.process = None
+        self.progress = 0
+        self.result = None
+        self.log = []
+        self._lines = queue.Queue()
+        self._reader = None
+
+    @property
+    def is_finished(self):
+        if self.process is None or self.process.poll() is None:
+            return False
+        return not self._reader.is_alive() and self._lines.empty()
+
+    @property
+    def is_running(self):
+        """Whether the process was started and hasn't exited yet"""
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def is_successful(self):
+        return self.is_finished and self.process.returncode == 0 and self.result is not None
+
+    @property
+    def failures(self):
+        """The asset folders that failed in a successful worker, as {"folder", "error"} dicts"""
+        return self.result.get("failures", []) if self.result is not None else []
+
+    @property
+    def imported_folders(self):
+        """The asset folders of a successful worker that were imported"""
+        if not self.is_successful:
+            return []
+        failed = {failure["folder"] for failure in self.failures}
+        return [asset_folder for asset_folder in self.asset_folders if asset_folder.path not in failed]
+
+    def start(self, command):
+        self.process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            errors="replace",
+        )
+        # Read the output in a thread, so polling never blocks the main process
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+
+    def _read_output(self):
+        for line in self.process.stdout:
+            self._lines.put(line.rstrip("\n"))
+        self.process.stdout.close()
+
+    def poll(self):
+        while True:
+            try:
+                line = self._lines.get_nowait()
+            except queue.Empty:
+                break
+            if line.startswith(WORKER_PROGRESS_PREFIX):
+                self.progress = int(line[len(WORKER_PROGRESS_PREFIX):].split("/")[0])
+            elif line.startswith(WORKER_RESULT_PREFIX):
+                self.result = json.loads(line[len(WORKER_RESULT_PREFIX):])
+            else:
+                self.log.append(line)
+                del self.log[:-WORKER_LOG_LINES]
+
+    def cancel(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+
+
+class WorkerPool:
+    """Imports a list of asset folders across several background Blender processes."""
+
+    def __init__(self, asset_folders, worker_count, settings, main_collection_name,
+                 meshes_catalog_uuid, materials_catalog_uuid, folder_catalogs=None):
+        self.work_dir = tempfile.mkdtemp(prefix="bia_workers_")
+        self.jobs = []
+
+        for i, shard in enumerate(shard_asset_folders(asset_folders, worker_count)):
+            job_path = os.path.join(self.work_dir, f"job_{i}.json")
+            output_path = os.path.join(self.work_dir, f"shard_{i}.blend")
+            with open(job_path, "w") as f:
+                json.dump({
+                    "settings": settings,
+                    "main_collection_name": main_collection_name,
+                    "meshes_catalog_uuid": meshes_catalog_uuid,
+                    "materials_catalog_uuid": materials_catalog_uuid,
+                    "folder_catalogs": {
+                        asset_folder.path: folder_catalogs[asset_folder.path]
+                        for asset_folder in shard if folder_catalogs and asset_folder.path in folder_catalogs
+                    },
+                    "output_path": output_path,
+                    "asset_folders": [asset_folder.to_dict() for asset_folder in shard],
+                }, f)
+            self.jobs.append(WorkerJob(i, shard, job_path, output_path))
+
+    @property
+    def total(self):
+        return sum(len(job.asset_folders) for job in self.jobs)
+
+    @property
+    def progress(self):
+        return sum(job.progress for job in self.jobs)
+
+    @property
+    def failed_jobs(self):
+        return [job for job in self.jobs if job.is_finished and not job.is_successful]
+
+    def get_command(self, job):
+        return get_worker_command("workers.worker_main", job.job_path, register=True)
+
+    def start(self):
+        for job in self.jobs:
+            job.start(self.get_command(job))
+
+    def poll(self):
+        """Update the progress of every worker, returning whether they have all finished"""
+        for job in self.jobs:
+            job.poll()
+        return all(job.is_finished for job in self.jobs)
+
+    def cancel(self):
+        for job in self.jobs:
+            job.cancel()
+
+    def append_results(self):
+        """Append the assets of every successful worker into the current file, returning them"""
+        appended = []
+        for job in self.jobs:
+            if job.is_successful:
+                appended += append_assets_from_file(job.output_path)
+        return appended
+
+    def cleanup(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def get_appended_objects(appended):
+    """Get the objects of the appended assets, which are in the appended collections in collection mode"""
+    objects = []
+    for id_data in appended:
+        if isinstance(id_data, bpy.types.Collection):
+            objects += id_data.all_objects
+        elif isinstance(id_data, bpy.types.Object):
+            objects.append(id_data)
+    return objects
+
+
+def append_assets_from_file(filepath):
+    props = bpy.context.scene.batch_import_assets_props
+
+    with bpy.data.libraries.load(filepath, link=False, assets_only=True) as (data_from, data_to):
+        data_to.collections = data_from.collections
+        data_to.objects = data_from.objects
+        data_to.materials = data_from.materials
+
+    main_collection = get_main_collection()
+    if props.asset_type == "COLLECTION":
+        for col in data_to.collections:
+            main_collection.children.link(col)
+    else:
+        for obj in data_to.objects:
+            main_collection.objects.link(obj)
+
+    # Keep the assets independent from the temporary shard file
+    library = bpy.data.libraries.get(os.path.basename(filepath))
+    if library is not None:
+        bpy.data.libraries.remove(library)
+
+    return [*data_to.collections, *data_to.objects, *data_to.materials]
+
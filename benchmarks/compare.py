@@ -0,0 +1,68 @@
+"""Compare two benchmark result files written by run_benchmarks.py, e.g. of two releases.
+
+    python benchmarks/compare.py baseline.json candidate.json [--threshold 0.1]
+
+Exits with status 1 when a benchmark of the candidate is slower than the baseline by more than the threshold.
+"""
+
+import sys
+import json
+import argparse
+
+
+def load_results(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def describe(results):
+    commit = results.get("git_commit", "")[:10]
+    return f"{results.get('addon_version', '?')} {commit} (Blender {results.get('blender_version', '?')})"
+
+
+def compare(baseline, candidate, threshold=0.1):
+    """Return the rows of the comparison, and the names of the benchmarks that regressed"""
+    rows = []
+    regressions = []
+    for name, result in candidate["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base["seconds"]:
+            rows.append((name, None, result["seconds"], None))
+            continue
+        ratio = result["seconds"] / base["seconds"]
+        rows.append((name, base["seconds"], result["seconds"], ratio))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="The slowdown ratio above which a benchmark counts as a regression")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    candidate = load_results(args.candidate)
+    if baseline.get("library") != candidate.get("library"):
+        print("Warning: the results were measured on different libraries")
+
+    print(f"Baseline:  {describe(baseline)}")
+    print(f"Candidate: {describe(candidate)}")
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    for name, base, seconds, ratio in rows:
+        if ratio is None:
+            print(f"{name:<32} {'-':>10} {seconds:>10.4f}s")
+            continue
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<32} {base:>10.4f}s {seconds:>10.4f}s {ratio:>7.2f}x{flag}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
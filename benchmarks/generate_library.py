@@ -0,0 +1,153 @@
+"""Generate a synthetic asset library to benchmark the batch importer with.
+
+The textures are small procedurally colored PNG files, written without Blender. The FBX files need Blender:
+
+    blender -b --factory-startup --python benchmarks/generate_library.py -- --output /tmp/library --folders 500
+
+Without Blender (plain Python), only the folder tree and the textures are generated.
+"""
+
+import os
+import sys
+import json
+import zlib
+import random
+import struct
+import argparse
+
+try:
+    import bpy
+    import bmesh
+except ImportError:
+    bpy = None
+
+
+# Naming convention -> (file name pattern, identifiers of the base color, AO, metallic, roughness, normal,
+# displacement and opacity maps)
+NAMING_CONVENTIONS = {
+    "suffix": ("{asset}_{identifier}.png",
+               ["BaseColor", "AO", "Metallic", "Roughness", "Normal", "Displacement", "Opacity"]),
+    "prefix": ("T_{asset}_{identifier}.png", ["Albedo", "AO", "Metal", "Rough", "N", "Disp", "Alpha"]),
+    "dash": ("{asset}-{identifier}.png", ["albedo", "ao", "metal", "rough", "nrm", "disp", "opacity"]),
+}
+
+
+def write_png(path, width, height, color):
+    """Write a plain RGB PNG file filled with a single color"""
+    row = b"\x00" + bytes(color) * width
+    raw = row * height
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw)))
+        f.write(chunk(b"IEND", b""))
+
+
+def write_fbx(path, name, subdivisions):
+    """Export a procedurally generated ico sphere as an FBX file"""
+    mesh = bpy.data.meshes.new(name)
+    bm = bmesh.new()
+    bmesh.ops.create_icosphere(bm, subdivisions=subdivisions, radius=1.0)
+    bm.to_mesh(mesh)
+    bm.free()
+
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    # The objects of the view layer aren't synced after a removal, so they may include the removed ones
+    for other in bpy.context.scene.objects:
+        other.select_set(other == obj)
+    bpy.ops.export_scene.fbx(filepath=path, use_selection=True)
+
+    bpy.data.objects.remove(obj)
+    bpy.data.meshes.remove(mesh)
+
+
+def get_asset_folder_path(root, index, depth, branching):
+    """Place an asset folder under depth levels of category folders"""
+    parts = []
+    value = index
+    for level in range(depth):
+        value //= branching
+        parts.append(f"Category{level}_{value % branching:02d}")
+    return os.path.join(root, *reversed(parts), f"Asset{index:05d}")
+
+
+def generate_library(
+    root, folders=100, depth=1, textures=5, naming="mixed", texture_size=64, shared_ratio=0.0,
+    subdivisions=2, with_fbx=True, seed=0,
+):
+    """Generate the library, returning the parameters it was generated with"""
+    rng = random.Random(seed)
+    with_fbx = with_fbx and bpy is not None
+    conventions = list(NAMING_CONVENTIONS) if naming == "mixed" else [naming]
+    # The colors of the shared textures, identical files are written for them in every folder
+    shared_colors = [(128, 128, 255), (200, 200, 200), (0, 0, 0)]
+
+    for i in range(folders):
+        asset = f"Asset{i:05d}"
+        folder = get_asset_folder_path(root, i, depth, max(2, round(folders ** (1 / (depth + 1)))))
+        os.makedirs(folder, exist_ok=True)
+
+        pattern, identifiers = NAMING_CONVENTIONS[conventions[i % len(conventions)]]
+        for identifier in identifiers[:textures]:
+            if rng.random() < shared_ratio:
+                color = rng.choice(shared_colors)
+            else:
+                color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            write_png(os.path.join(folder, pattern.format(asset=asset, identifier=identifier)),
+                      texture_size, texture_size, color)
+
+        if with_fbx:
+            write_fbx(os.path.join(folder, f"{asset}.fbx"), asset, subdivisions)
+
+    params = {
+        "folders": folders,
+        "depth": depth,
+        "textures": textures,
+        "naming": naming,
+        "texture_size": texture_size,
+        "shared_ratio": shared_ratio,
+        "subdivisions": subdivisions,
+        "with_fbx": with_fbx,
+        "seed": seed,
+    }
+    with open(os.path.join(root, "library.json"), "w") as f:
+        json.dump(params, f, indent=2)
+    return params
+
+
+def add_arguments(parser):
+    parser.add_argument("--folders", type=int, default=100, help="The number of asset folders")
+    parser.add_argument("--depth", type=int, default=1, help="The number of category folder levels")
+    parser.add_argument("--textures", type=int, default=5, help="The number of textures per asset folder (max 7)")
+    parser.add_argument("--naming", default="mixed", choices=["mixed", *NAMING_CONVENTIONS],
+                        help="The texture naming convention")
+    parser.add_argument("--texture-size", type=int, default=64, help="The resolution of the textures")
+    parser.add_argument("--shared-ratio", type=float, default=0.0,
+                        help="The ratio of textures that are byte-identical across asset folders")
+    parser.add_argument("--subdivisions", type=int, default=2, help="The subdivisions of the ico sphere meshes")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Generate a synthetic asset library")
+    parser.add_argument("--output", required=True, help="The folder to generate the library in")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if bpy is not None:
+        bpy.ops.wm.read_homefile(use_empty=True)
+    params = generate_library(
+        args.output, args.folders, args.depth, args.textures, args.naming, args.texture_size,
+        args.shared_ratio, args.subdivisions, seed=args.seed,
+    )
+    print(json.dumps(params))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Benchmark the batch importer in headless Blender, writing the results to a JSON file.
+
+    blender -b --factory-startup --python benchmarks/run_benchmarks.py -- --output results.json [--folders 200]
+
+A synthetic library is generated in a temporary folder (see generate_library.py), unless --library points
+to an existing one. Compare two result files, e.g. of two releases, with compare.py.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import random
+import datetime
+import subprocess
+
+import bpy
+import bmesh
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import generate_library  # noqa: E402
+import batch_asset_importer  # noqa: E402
+from batch_asset_importer import catalog, functions, textures  # noqa: E402
+from batch_asset_importer.materials import MaterialTemplateCache  # noqa: E402
+from batch_asset_importer.pipeline import ImportPipeline  # noqa: E402
+
+RESULTS_FORMAT = 1
+
+
+def get_git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+class BenchmarkRunner:
+
+    def __init__(self, library, work_dir, settings):
+        self.library = library
+        self.work_dir = work_dir
+        self.settings = settings
+        self.results = {}
+
+    def reset_file(self, name):
+        """Start from an empty file saved in the work folder, with the benchmark settings"""
+        bpy.ops.wm.read_homefile(use_empty=True)
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.join(self.work_dir, f"{name}.blend"))
+        props = bpy.context.scene.batch_import_assets_props
+        functions.props_from_dict(props, self.settings)
+        props.folder_path = self.library
+        props.main_collection_name = os.path.basename(self.library)
+        return props
+
+    def record(self, name, seconds, items):
+        self.results[name] = {
+            "seconds": round(seconds, 6),
+            "items": items,
+            "items_per_second": round(items / seconds, 3) if seconds > 0 else 0.0,
+        }
+        print(f"{name:<32} {seconds:>10.4f}s {items:>8} items")
+
+    def run(self):
+        self.bench_texture_classification()
+        self.bench_scan()
+        self.bench_import()
+        self.bench_transforms()
+        self.bench_materials()
+        self.bench_catalogs()
+        self.bench_pipeline()
+        return self.results
+
+    def bench_texture_classification(self):
+        self.reset_file("classification")
+        names = textures.generate_texture_names(100_000)
+
+        start = time.perf_counter()
+        functions.get_texture_classifier().classify_many(names)
+        self.record("texture_classifier", time.perf_counter() - start, len(names))
+
+        names = names[:10_000]
+        start = time.perf_counter()
+        for name in names:
+            functions.get_texture_type(name)
+        self.record("get_texture_type", time.perf_counter() - start, len(names))
+
+    def bench_scan(self):
+        self.reset_file("scan")
+        start = time.perf_counter()
+        manifest = functions.scan_source_folder(self.library)
+        self.record("scan", time.perf_counter() - start, len(manifest))
+
+    def bench_import(self):
+        self.reset_file("import")
+        manifest = functions.scan_source_folder(self.library)
+
+        start = time.perf_counter()
+        functions.import_fbx_files_and_textures(manifest)
+        self.record("import_fbx_files_and_textures", time.perf_counter() - start, len(manifest))
+
+        functions.clear_parents_and_keep_transform()
+        functions.delete_empties()
+        objects = len(bpy.context.view_layer.objects)
+        start = time.perf_counter()
+        functions.apply_all_transforms()
+        self.record("apply_all_transforms", time.perf_counter() - start, objects)
+
+        start = time.perf_counter()
+        functions.mark_all_objects_as_asset("", generate_previews=False)
+        self.record("mark_all_objects_as_asset", time.perf_counter() - start, objects)
+
+    def create_transformed_objects(self, count, shared_ratio=0.2, seed=0):
+        """Create mesh objects with random transforms, some of them sharing their mesh"""
+        rng = random.Random(seed)
+        collection = bpy.context.scene.collection
+        objects = []
+        for i in range(count):
+            if objects and rng.random() < shared_ratio:
+                mesh = rng.choice(objects).data
+            else:
+                mesh = bpy.data.meshes.new(f"Mesh {i}")
+                bm = bmesh.new()
+                bmesh.ops.create_icosphere(bm, subdivisions=2, radius=1.0)
+                bm.to_mesh(mesh)
+                bm.free()
+            obj = bpy.data.objects.new(f"Object {i}", mesh)
+            obj.location = [rng.uniform(-100, 100) for _ in range(3)]
+            obj.rotation_euler = [rng.uniform(0, 6.28) for _ in range(3)]
+            obj.scale = [rng.uniform(0.5, 2.0) for _ in range(3)]
+            collection.objects.link(obj)
+            objects.append(obj)
+        return objects
+
+    def bench_transforms(self, count=1000):
+        """Compare the transform_apply operator with the operator-free transform baking"""
+        self.reset_file("transforms_operator")
+        objects = self.create_transformed_objects(count)
+        start = time.perf_counter()
+        for obj in objects:
+            obj.select_set(True)
+        bpy.context.view_layer.objects.active = objects[0]
+        # transform_apply only isolates the shared meshes when invoked from the UI, and aborts otherwise
+        bpy.ops.object.make_single_user(type="SELECTED_OBJECTS", object=False, obdata=True)
+        bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
+        self.record("transform_apply_operator", time.perf_counter() - start, count)
+
+        self.reset_file("transforms")
+        objects = self.create_transformed_objects(count)
+        start = time.perf_counter()
+        functions.apply_all_transforms(objects)
+        self.record("apply_all_transforms_1000", time.perf_counter() - start, count)
+
+    def bench_materials(self):
+        self.reset_file("materials")
+        manifest = functions.scan_source_folder(self.library)
+        texture_sets = [functions.import_textures_from_folder(asset_folder) for asset_folder in manifest]
+
+        start = time.perf_counter()
+        for i, texture_set in enumerate(texture_sets):
+            functions.assign_textures_to_material(functions.create_material(f"Node By Node {i}"), texture_set)
+        self.record("assign_textures_to_material", time.perf_counter() - start, len(texture_sets))
+
+        start = time.perf_counter()
+        templates = MaterialTemplateCache()
+        for i, texture_set in enumerate(texture_sets):
+            templates.instantiate(f"From Template {i}", texture_set)
+        templates.clear()
+        self.record("material_templates", time.perf_counter() - start, len(texture_sets))
+
+    def bench_catalogs(self, count=2000):
+        catalog_dir = tempfile.mkdtemp(dir=self.work_dir)
+
+        start = time.perf_counter()
+        catalog_file = catalog.AssetCatalogFile(catalog_dir)
+        for i in range(count):
+            catalog_file.add_catalog(f"Catalog {i}", f"Library/Category {i // 100}/Catalog {i}")
+            catalog_file.write()
+        self.record("catalog_add_and_write", time.perf_counter() - start, count)
+
+        start = time.perf_counter()
+        catalog_file = catalog.AssetCatalogFile(catalog_dir)
+        self.record("catalog_read", time.perf_counter() - start, len(catalog_file.catalogs))
+
+    def bench_pipeline(self):
+        props = self.reset_file("pipeline")
+        props.is_save_blend_file = True
+        props.is_write_report = False
+
+        start = time.perf_counter()
+        summary = ImportPipeline(bpy.context).run()
+        self.record("pipeline", time.perf_counter() - start, summary["counts"]["scanned"])
+        self.results["pipeline"]["stages"] = summary["timings"]
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Benchmark the batch importer")
+    parser.add_argument("--output", required=True, help="The JSON file to write the results to")
+    parser.add_argument("--library", help="An existing library to benchmark with, instead of a generated one")
+    parser.add_argument("--workers", type=int, default=1, help="The number of workers of the pipeline benchmark")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated library and blend files")
+    generate_library.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if not hasattr(bpy.types.Scene, "batch_import_assets_props"):
+        batch_asset_importer.register()
+
+    work_dir = tempfile.mkdtemp(prefix="bia_benchmark_")
+    library = args.library
+    library_params = {"path": library}
+    if not library:
+        library = os.path.join(work_dir, "Library")
+        bpy.ops.wm.read_homefile(use_empty=True)
+        library_params = generate_library.generate_library(
+            library, args.folders, args.depth, args.textures, args.naming, args.texture_size,
+            args.shared_ratio, args.subdivisions, seed=args.seed,
+        )
+
+    # The default settings, without the options that depend on the machine
+    settings = functions.props_to_dict(bpy.context.scene.batch_import_assets_props)
+    settings.update(worker_count=args.workers, is_incremental=False, profiled_stage="NONE")
+
+    try:
+        results = BenchmarkRunner(library, work_dir, settings).run()
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = {
+        "format": RESULTS_FORMAT,
+        "addon_version": ".".join(map(str, batch_asset_importer.bl_info["version"])),
+        "git_commit": get_git_commit(),
+        "blender_version": bpy.app.version_string,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "library": library_params,
+        "workers": args.workers,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()